@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from api import signals  # noqa: F401
+        from api.metrics import instrument_serializers
+        from api.signals import instrument_connections
+
+        instrument_serializers()
+        instrument_connections()
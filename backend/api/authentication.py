@@ -0,0 +1,23 @@
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+
+from backend.constants import AUTH_TOKEN_CACHE_TIMEOUT
+from users.tokens import get_token_cache_key
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Аутентификация по токену с кэшированием токена вместе с пользователем.
+
+    Запись живёт AUTH_TOKEN_CACHE_TIMEOUT секунд и удаляется сигналами при
+    выходе (удалении токена), смене пароля, деактивации и других изменениях
+    пользователя.
+    """
+
+    def authenticate_credentials(self, key):
+        cache_key = get_token_cache_key(key)
+        token = cache.get(cache_key)
+        if token is not None:
+            return token.user, token
+        user, token = super().authenticate_credentials(key)
+        cache.set(cache_key, token, AUTH_TOKEN_CACHE_TIMEOUT)
+        return user, token
@@ -1,6 +1,16 @@
 import django_filters
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db.models import (
+    Case,
+    Exists,
+    IntegerField,
+    OuterRef,
+    Q,
+    Value,
+    When
+)
 
-from recipes.models import Recipe, Ingredient, Tag
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
 
 
 class RecipeFilterSet(django_filters.FilterSet):
@@ -20,22 +30,42 @@ class RecipeFilterSet(django_filters.FilterSet):
         model = Recipe
         fields = ('is_favorited', 'is_in_shopping_cart', 'author', 'tags')
 
-    def get_is_favorited(self, queryset, name, value):
+    def filter_user_recipes(self, queryset, model, value):
+        # Фильтр строит свой Exists, а не ссылается на аннотацию:
+        # аннотации есть только у выборки для чтения.
         user = self.request.user
-        return queryset.filter(
-            favorites__user=self.request.user
-        ) if user.is_authenticated and value == 1 else queryset
+        if not user.is_authenticated or value != 1:
+            return queryset
+        return queryset.filter(Exists(model.objects.filter(
+            user=user, recipe=OuterRef('pk')
+        )))
+
+    def get_is_favorited(self, queryset, name, value):
+        return self.filter_user_recipes(queryset, Favorite, value)
 
     def get_is_in_shopping_cart(self, queryset, name, value):
-        user = self.request.user
-        return queryset.filter(
-            shopping_carts__user=self.request.user
-        ) if user.is_authenticated and value == 1 else queryset
+        return self.filter_user_recipes(queryset, ShoppingCart, value)
 
 
 class IngredientFilterSet(django_filters.FilterSet):
     name = django_filters.CharFilter(lookup_expr='istartswith')
+    search = django_filters.CharFilter(method='get_search')
 
     class Meta:
         model = Ingredient
-        fields = ('name',)
+        fields = ('name', 'search')
+
+    def get_search(self, queryset, name, value):
+        # Ветви условия обслуживают триграммные индексы по UPPER(name) для
+        # icontains и по name для %, без последовательного сканирования.
+        return queryset.filter(
+            Q(name__icontains=value) | Q(name__trigram_similar=value)
+        ).annotate(
+            rank=Case(
+                When(name__istartswith=value, then=Value(0)),
+                When(name__icontains=value, then=Value(1)),
+                default=Value(2),
+                output_field=IntegerField()
+            ),
+            similarity=TrigramSimilarity('name', value)
+        ).order_by('rank', '-similarity', 'name')
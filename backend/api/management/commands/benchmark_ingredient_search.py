@@ -0,0 +1,59 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.filters import IngredientFilterSet
+from backend.constants import INGREDIENT_SEARCH_LIMIT
+from backend.stats import summarize
+from recipes.models import Ingredient
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает время поиска ингредиентов по istartswith '
+            'и нечёткого поиска по триграммам')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--terms', nargs='*', default=None)
+        parser.add_argument('--sample', type=int, default=50)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        terms = options['terms'] or self.sample_terms(
+            options['sample'], random.Random(options['seed'])
+        )
+        if not terms:
+            raise CommandError('Нет ингредиентов для подбора запросов')
+        modes = {
+            'istartswith': lambda term: list(
+                Ingredient.objects.filter(name__istartswith=term)
+            ),
+            'search': lambda term: list(IngredientFilterSet(
+                {'search': term}, queryset=Ingredient.objects.all()
+            ).qs[:INGREDIENT_SEARCH_LIMIT]),
+        }
+        for mode, run in modes.items():
+            timings = []
+            found = 0
+            for _ in range(options['repeat']):
+                for term in terms:
+                    start = time.perf_counter()
+                    found += len(run(term))
+                    timings.append((time.perf_counter() - start) * 1000)
+            stats = summarize(timings, 'ms')
+            self.stdout.write(
+                '{mode}: запросов {count}, среднее {mean_ms:.2f} мс, '
+                'p95 {p95_ms:.2f} мс, найдено в среднем {found:.1f}'.format(
+                    mode=mode, found=found / len(timings), **stats
+                )
+            )
+
+    @staticmethod
+    def sample_terms(sample, rng):
+        names = list(Ingredient.objects.values_list('name', flat=True))
+        terms = []
+        for name in rng.sample(names, min(sample, len(names))):
+            start = rng.randrange(len(name))
+            terms.append(name[start:start + rng.randint(2, 5)])
+        return terms
@@ -0,0 +1,233 @@
+import json
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from rest_framework.request import Request
+
+from api.serializers import FollowUserSerializer, RecipeReadSerializer
+from api.views import CustomUserViewSet, RecipeViewSet
+from backend.benchmarks import NO_CACHE, make_request, rolled_back
+from backend.constants import DEFAULT_PAGE_SIZE
+from backend.stats import summarize
+from recipes.models import (
+    Favorite,
+    IngredientToRecipe,
+    Recipe,
+    ShoppingCart,
+    ShoppingListItem
+)
+from users.models import CustomUser, Follow
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / 'benchmarks' / 'serializers.json'
+DOWNLOAD_FORMATS = ('txt', 'csv', 'pdf')
+
+
+def make_view(viewset, action, user, params=None):
+    request = Request(make_request('get', '/', params))
+    request.user = user
+    return viewset(
+        request=request, action=action, format_kwarg=None, args=(), kwargs={}
+    )
+
+
+class Command(BaseCommand):
+    help = ('Замеряет RecipeReadSerializer, FollowUserSerializer и выгрузку '
+            'списка покупок на текущих данных, сохраняет базовые значения '
+            'и сравнивает с ними')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE)
+        parser.add_argument(
+            '--baseline', default=str(DEFAULT_BASELINE),
+            help='JSON-файл с базовыми значениями'
+        )
+        parser.add_argument(
+            '--save-baseline', action='store_true',
+            help='Записать результаты как новые базовые значения'
+        )
+        parser.add_argument(
+            '--compare', action='store_true',
+            help='Сравнить с базовыми значениями'
+        )
+        parser.add_argument(
+            '--threshold', type=float, default=20,
+            help='Допустимый рост p50 относительно базового, в процентах'
+        )
+
+    def handle(self, *args, **options):
+        self.repeat = options['repeat']
+        self.warmup = options['warmup']
+        if self.repeat < 1:
+            raise CommandError('--repeat должен быть положительным')
+        reader = CustomUser.objects.annotate(
+            carts=Count('shopping_carts')
+        ).order_by('-carts', 'pk').first()
+        follower = CustomUser.objects.annotate(
+            follows=Count('follower')
+        ).order_by('-follows', 'pk').first()
+        if reader is None or not Recipe.objects.exists():
+            raise CommandError(
+                'Нет данных, сначала выполните generate_dataset'
+            )
+        with rolled_back(CACHES=NO_CACHE):
+            results = {
+                'recipe_read': self.bench_recipes(
+                    reader, options['page_size']
+                ),
+                'follow_user': self.bench_follows(
+                    follower, options['page_size']
+                ),
+            }
+            for format in DOWNLOAD_FORMATS:
+                results[f'download_shopping_cart_{format}'] = (
+                    self.bench_download(reader, format)
+                )
+        report = {'dataset': self.get_dataset(), 'results': results}
+        self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
+        baseline_path = Path(options['baseline'])
+        if options['compare']:
+            self.compare(baseline_path, report, options['threshold'])
+        if options['save_baseline']:
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            baseline_path.write_text(
+                json.dumps(report, ensure_ascii=False, indent=2),
+                encoding='utf-8'
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f'Базовые значения сохранены в {baseline_path}'
+            ))
+
+    @staticmethod
+    def get_dataset():
+        return {
+            'users': CustomUser.objects.count(),
+            'follows': Follow.objects.count(),
+            'recipes': Recipe.objects.count(),
+            'recipe_ingredients': IngredientToRecipe.objects.count(),
+            'favorites': Favorite.objects.count(),
+            'shopping_carts': ShoppingCart.objects.count(),
+            'shopping_list_items': ShoppingListItem.objects.count(),
+        }
+
+    def measure(self, run):
+        """Выполняет run() с прогревом; run возвращает словарь фаз в мс."""
+        for _ in range(self.warmup):
+            run()
+        phases = defaultdict(list)
+        for _ in range(self.repeat):
+            with CaptureQueriesContext(connection) as context:
+                for phase, value in run().items():
+                    phases[phase].append(value)
+        result = {
+            phase: summarize(values, 'ms')
+            for phase, values in phases.items()
+        }
+        result['queries'] = len(context.captured_queries)
+        return result
+
+    def bench_recipes(self, user, page_size):
+        view = make_view(RecipeViewSet, 'list', user)
+
+        def run():
+            start = time.perf_counter()
+            recipes = list(view.get_read_queryset()[:page_size])
+            fetched = time.perf_counter()
+            RecipeReadSerializer(
+                recipes, many=True, context=view.get_serializer_context()
+            ).data
+            return {
+                'query': (fetched - start) * 1000,
+                'serialize': (time.perf_counter() - fetched) * 1000,
+            }
+
+        return self.measure(run)
+
+    def bench_follows(self, user, page_size):
+        view = make_view(
+            CustomUserViewSet, 'subscriptions', user, {'recipes_limit': 3}
+        )
+
+        def run():
+            start = time.perf_counter()
+            authors = list(view.get_queryset()[:page_size])
+            previews = defaultdict(list)
+            for recipe in Recipe.objects.previews_for_authors(
+                    [author.pk for author in authors], 3
+            ):
+                previews[recipe.author_id].append(recipe)
+            for author in authors:
+                author.recipe_previews = previews[author.pk]
+            fetched = time.perf_counter()
+            FollowUserSerializer(
+                authors, many=True, context=view.get_serializer_context()
+            ).data
+            return {
+                'query': (fetched - start) * 1000,
+                'serialize': (time.perf_counter() - fetched) * 1000,
+            }
+
+        return self.measure(run)
+
+    def bench_download(self, user, format):
+        path = '/api/recipes/download_shopping_cart/'
+        match = resolve(path)
+
+        def run():
+            request = make_request('get', path, {'format': format}, user)
+            start = time.perf_counter()
+            response = match.func(request, *match.args, **match.kwargs)
+            size = len(b''.join(response.streaming_content))
+            if response.status_code != 200 or not size:
+                raise CommandError(
+                    f'Выгрузка {format} вернула {response.status_code}'
+                )
+            return {'total': (time.perf_counter() - start) * 1000}
+
+        return self.measure(run)
+
+    def compare(self, path, report, threshold):
+        if not path.exists():
+            raise CommandError(f'Нет базовых значений: {path}')
+        baseline = json.loads(path.read_text(encoding='utf-8'))
+        if baseline['dataset'] != report['dataset']:
+            self.stdout.write(self.style.WARNING(
+                'Объём данных отличается от базового, сравнение неточное'
+            ))
+        regressions = []
+        for name, result in report['results'].items():
+            for phase, stats in result.items():
+                if phase == 'queries':
+                    continue
+                try:
+                    before = baseline['results'][name][phase]['p50_ms']
+                except KeyError:
+                    continue
+                change = (stats['p50_ms'] - before) / before * 100
+                self.stdout.write(
+                    f'{name}.{phase}: p50 {before:.2f} → '
+                    f'{stats["p50_ms"]:.2f} мс ({change:+.1f}%)'
+                )
+                if change > threshold:
+                    regressions.append(f'{name}.{phase}')
+            before_queries = baseline['results'].get(name, {}).get('queries')
+            if before_queries is not None and (
+                    result['queries'] > before_queries):
+                self.stdout.write(
+                    f'{name}: запросов {before_queries} → {result["queries"]}'
+                )
+                regressions.append(f'{name}.queries')
+        if regressions:
+            raise CommandError(
+                'Регрессия относительно базовых значений: '
+                + ', '.join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS('Регрессий нет'))
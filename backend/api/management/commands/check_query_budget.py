@@ -0,0 +1,131 @@
+import base64
+import io
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+
+from api.views import RecipeViewSet
+from backend.benchmarks import LOCAL_CACHE, make_request, rolled_back
+from recipes.models import Ingredient, IngredientToRecipe, Recipe, Tag
+from users.models import CustomUser
+
+QUERY_BUDGETS = {
+    'list': 6,
+    'detail': 5,
+    'create': 13,
+    'update': 12,
+}
+RECIPES_COUNT = 12
+INGREDIENTS_PER_RECIPE = 3
+TAGS_PER_RECIPE = 2
+# Проверка идёт во внешней транзакции, поэтому вложенные atomic()
+# дают точки сохранения, которых нет при обычной обработке запроса.
+SAVEPOINT_STATEMENTS = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO')
+
+
+class Command(BaseCommand):
+    help = ('Проверяет, что число SQL-запросов эндпоинтов рецептов '
+            'не превышает заявленный бюджет')
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as media_root:
+            with rolled_back(MEDIA_ROOT=media_root, CACHES=LOCAL_CACHE):
+                results = self.measure()
+        failures = []
+        for name, count in results:
+            budget = QUERY_BUDGETS[name.split()[0]]
+            self.stdout.write(f'{name}: {count} / {budget}')
+            if count > budget:
+                failures.append(name)
+        list_counts = {count for name, count in results if name[:4] == 'list'}
+        if len(list_counts) > 1:
+            failures.append('list зависит от размера страницы')
+        if failures:
+            raise CommandError(
+                'Превышен бюджет запросов: {}'.format(', '.join(failures))
+            )
+        self.stdout.write(self.style.SUCCESS('Бюджет запросов соблюдён'))
+
+    def measure(self):
+        author, reader = [
+            CustomUser.objects.create_user(
+                email=f'budget{index}@example.com',
+                username=f'budget{index}',
+                first_name='Budget',
+                last_name='Budget',
+                password=None
+            )
+            for index in range(2)
+        ]
+        tags = Tag.objects.bulk_create(
+            Tag(name=f'budget{index}', color='#000000', slug=f'budget{index}')
+            for index in range(TAGS_PER_RECIPE)
+        )
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'budget{index}', measurement_unit='г')
+            for index in range(INGREDIENTS_PER_RECIPE)
+        )
+        for index in range(RECIPES_COUNT):
+            recipe = Recipe.objects.create(
+                author=author, name=f'budget{index}', text='budget',
+                cooking_time=1, image='budget.png'
+            )
+            recipe.tags.set(tags)
+            IngredientToRecipe.objects.bulk_create(
+                IngredientToRecipe(
+                    recipe=recipe, ingredient=ingredient, amount=1
+                )
+                for ingredient in ingredients
+            )
+        payload = {
+            'ingredients': [
+                {'id': ingredient.pk, 'amount': 1}
+                for ingredient in ingredients
+            ],
+            'tags': [tag.pk for tag in tags],
+            'image': self.get_image(),
+            'name': 'budget',
+            'text': 'budget',
+            'cooking_time': 1
+        }
+        results = [
+            (f'list limit={limit}', self.count_queries(
+                reader, 'get', 'list', '/api/recipes/', {'limit': limit}
+            ))
+            for limit in (1, RECIPES_COUNT)
+        ]
+        results.append(('detail', self.count_queries(
+            reader, 'get', 'retrieve', f'/api/recipes/{recipe.pk}/',
+            pk=recipe.pk
+        )))
+        results.append(('create', self.count_queries(
+            author, 'post', 'create', '/api/recipes/', payload
+        )))
+        results.append(('update', self.count_queries(
+            author, 'patch', 'partial_update', f'/api/recipes/{recipe.pk}/',
+            payload, pk=recipe.pk
+        )))
+        return results
+
+    def count_queries(self, user, method, action, path, data=None, **kwargs):
+        request = make_request(method, path, data, user)
+        view = RecipeViewSet.as_view({method: action})
+        with CaptureQueriesContext(connection) as context:
+            response = view(request, **kwargs)
+        if response.status_code >= 400:
+            raise CommandError(f'{path}: {response.status_code} '
+                               f'{response.data}')
+        return sum(
+            not query['sql'].startswith(SAVEPOINT_STATEMENTS)
+            for query in context.captured_queries
+        )
+
+    @staticmethod
+    def get_image():
+        buffer = io.BytesIO()
+        Image.new('RGB', (1, 1)).save(buffer, 'PNG')
+        return ('data:image/png;base64,'
+                + base64.b64encode(buffer.getvalue()).decode())
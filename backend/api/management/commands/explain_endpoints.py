@@ -0,0 +1,187 @@
+import json
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+
+from backend.benchmarks import NO_CACHE, make_request, rolled_back
+from recipes.models import Recipe, Tag
+from users.models import CustomUser
+
+# (название, путь, параметры запроса, нужна ли авторизация)
+ENDPOINTS = (
+    ('tags', '/api/tags/', {}, False),
+    ('ingredients', '/api/ingredients/', {'name': 'а'}, False),
+    ('ingredients_search', '/api/ingredients/', {'search': 'мол'}, False),
+    ('recipes', '/api/recipes/', {}, False),
+    ('recipes_auth', '/api/recipes/', {}, True),
+    ('recipes_cursor', '/api/recipes/', {'cursor': ''}, True),
+    ('recipes_by_tag', '/api/recipes/', {'tags': '{tag}'}, True),
+    ('recipes_by_author', '/api/recipes/', {'author': '{user}'}, True),
+    ('recipes_favorited', '/api/recipes/', {'is_favorited': 1}, True),
+    ('recipes_in_shopping_cart', '/api/recipes/',
+     {'is_in_shopping_cart': 1}, True),
+    ('recipe', '/api/recipes/{recipe}/', {}, True),
+    ('feed', '/api/recipes/feed/', {}, True),
+    ('download_shopping_cart', '/api/recipes/download_shopping_cart/', {},
+     True),
+    ('users', '/api/users/', {}, True),
+    ('user', '/api/users/{user}/', {}, True),
+    ('me', '/api/users/me/', {}, True),
+    ('subscriptions', '/api/users/subscriptions/', {'recipes_limit': 3},
+     True),
+)
+EXPLAIN = 'EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) '
+# QuerySet.iterator() читает через серверный курсор.
+DECLARE_CURSOR = re.compile(r'^DECLARE\s.*?\sCURSOR\s.*?\sFOR\s', re.S)
+
+
+def walk(node):
+    yield node
+    for child in node.get('Plans', ()):
+        yield from walk(child)
+
+
+def get_flags(plan, min_rows):
+    flags = []
+    for node in walk(plan):
+        if node['Node Type'] == 'Seq Scan':
+            rows = node['Actual Rows'] + node.get('Rows Removed by Filter', 0)
+            if rows >= min_rows:
+                flags.append({
+                    'type': 'seq_scan',
+                    'relation': node['Relation Name'],
+                    'rows_scanned': rows,
+                    'filter': node.get('Filter'),
+                })
+        elif node['Node Type'] in ('Sort', 'Incremental Sort'):
+            flags.append({
+                'type': 'sort',
+                'key': node['Sort Key'],
+                'method': node.get('Sort Method'),
+                'space_type': node.get('Sort Space Type'),
+                'rows': node['Actual Rows'],
+            })
+    return flags
+
+
+class Command(BaseCommand):
+    help = ('Выполняет EXPLAIN (ANALYZE, BUFFERS) для всех SELECT-запросов '
+            'основных эндпоинтов и выводит отчёт в JSON с отметками о '
+            'последовательном сканировании и сортировках')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=int,
+            help='id пользователя, от имени которого выполняются запросы'
+        )
+        parser.add_argument(
+            '--min-rows',
+            type=int,
+            default=0,
+            help='Отмечать последовательное сканирование от стольких строк'
+        )
+        parser.add_argument(
+            '--plans',
+            action='store_true',
+            help='Добавить в отчёт полные планы'
+        )
+        parser.add_argument(
+            '--output',
+            help='Файл для отчёта; по умолчанию stdout'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Отчёт поддерживается только для PostgreSQL')
+        users = CustomUser.objects.order_by('pk')
+        if options['user'] is not None:
+            users = users.filter(pk=options['user'])
+        user = users.first()
+        if user is None:
+            raise CommandError('Нет пользователя для авторизованных запросов')
+        placeholders = {
+            'user': user.pk,
+            'recipe': Recipe.objects.values_list('pk', flat=True).first(),
+            'tag': Tag.objects.values_list('slug', flat=True).first(),
+        }
+        report = []
+        # Без кэша эндпоинты выполняют все свои запросы.
+        with rolled_back(CACHES=NO_CACHE):
+            for endpoint in ENDPOINTS:
+                report.append(self.explain_endpoint(
+                    endpoint, user, placeholders, options
+                ))
+        queries = [query for item in report for query in item['queries']]
+        content = json.dumps({
+            'summary': {
+                'endpoints': len(report),
+                'queries': len(queries),
+                'seq_scans': sum(
+                    flag['type'] == 'seq_scan'
+                    for query in queries for flag in query['flags']
+                ),
+                'sorts': sum(
+                    flag['type'] == 'sort'
+                    for query in queries for flag in query['flags']
+                ),
+            },
+            'endpoints': report,
+        }, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(content)
+        else:
+            self.stdout.write(content)
+
+    def explain_endpoint(self, endpoint, user, placeholders, options):
+        name, path, params, authenticated = endpoint
+        if None in placeholders.values() and '{' in path + str(params):
+            return {'name': name, 'path': path, 'skipped': 'нет данных',
+                    'queries': []}
+        path = path.format(**placeholders)
+        params = {
+            key: str(value).format(**placeholders)
+            for key, value in params.items()
+        }
+        request = make_request(
+            'get', path, params, user if authenticated else None
+        )
+        match = resolve(path)
+        with CaptureQueriesContext(connection) as context:
+            response = match.func(request, *match.args, **match.kwargs)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            else:
+                response.render()
+        queries = []
+        with connection.cursor() as cursor:
+            for captured in context.captured_queries:
+                sql = DECLARE_CURSOR.sub('', captured['sql'])
+                if not sql.lstrip().upper().startswith('SELECT'):
+                    continue
+                cursor.execute(EXPLAIN + sql)
+                result = cursor.fetchone()[0]
+                result = (json.loads(result)
+                          if isinstance(result, str) else result)[0]
+                plan = result['Plan']
+                query = {
+                    'sql': sql,
+                    'planning_time_ms': result['Planning Time'],
+                    'execution_time_ms': result['Execution Time'],
+                    'shared_hit_blocks': plan.get('Shared Hit Blocks'),
+                    'shared_read_blocks': plan.get('Shared Read Blocks'),
+                    'flags': get_flags(plan, options['min_rows']),
+                }
+                if options['plans']:
+                    query['plan'] = plan
+                queries.append(query)
+        return {
+            'name': name,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'queries': queries,
+        }
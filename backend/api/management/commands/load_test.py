@@ -0,0 +1,165 @@
+import http.client
+import json
+import threading
+import time
+from collections import defaultdict
+from itertools import cycle
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from backend.stats import summarize
+
+DEFAULT_PATHS = (
+    '/api/recipes/',
+    '/api/tags/',
+    '/api/users/subscriptions/?recipes_limit=3',
+    '/api/recipes/download_shopping_cart/',
+)
+READ_CHUNK_SIZE = 1024
+
+
+def rotate(paths, shift):
+    """Разные клиенты начинают с разных эндпоинтов."""
+    shift %= len(paths)
+    return paths[shift:] + paths[:shift]
+
+
+def summarize_requests(latencies, duration):
+    stats = summarize(latencies, 'ms')
+    if stats is None:
+        return {'requests': 0}
+    return {
+        'requests': stats.pop('count'),
+        'rps': len(latencies) / duration,
+        **stats,
+    }
+
+
+class Command(BaseCommand):
+    help = ('Нагружает запущенный сервер параллельными клиентами и выводит '
+            'пропускную способность и задержки по эндпоинтам; результаты '
+            'двух запусков (WSGI и ASGI) можно сравнить через --baseline')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://localhost:8000')
+        parser.add_argument(
+            '--path', action='append', dest='paths',
+            help='Эндпоинт; можно указать несколько раз'
+        )
+        parser.add_argument('--token', help='Токен для авторизации')
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--duration', type=float, default=30)
+        parser.add_argument(
+            '--slow-clients', type=int, default=0,
+            help='Сколько клиентов читают ответ медленно'
+        )
+        parser.add_argument(
+            '--read-delay', type=float, default=0.05,
+            help='Пауза медленного клиента между чтениями по 1 КБ, с'
+        )
+        parser.add_argument('--output', help='Файл для результатов в JSON')
+        parser.add_argument(
+            '--baseline', help='Результаты предыдущего запуска для сравнения'
+        )
+
+    def handle(self, *args, **options):
+        url = urlsplit(options['url'])
+        if url.scheme not in ('http', 'https'):
+            raise CommandError('Укажите адрес сервера с http:// или https://')
+        self.url = url
+        self.headers = {}
+        if options['token']:
+            self.headers['Authorization'] = f'Token {options["token"]}'
+        paths = list(options['paths'] or DEFAULT_PATHS)
+        self.deadline = time.monotonic() + options['duration']
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        clients = [
+            threading.Thread(target=self.run_client, args=(
+                cycle(rotate(paths, number)),
+                options['read_delay'] if number < options['slow_clients']
+                else 0
+            ))
+            for number in range(options['concurrency'])
+        ]
+        start = time.monotonic()
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+        duration = time.monotonic() - start
+        report = {
+            'url': options['url'],
+            'concurrency': options['concurrency'],
+            'slow_clients': options['slow_clients'],
+            'duration_s': duration,
+            'total': summarize_requests(
+                [value for values in self.latencies.values()
+                 for value in values],
+                duration
+            ),
+            'paths': {
+                path: {
+                    **summarize_requests(self.latencies[path], duration),
+                    'errors': self.errors[path],
+                }
+                for path in paths
+            },
+        }
+        content = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(content)
+        self.stdout.write(content)
+        if options['baseline']:
+            self.compare(options['baseline'], report)
+
+    def connect(self):
+        connection_class = (
+            http.client.HTTPSConnection if self.url.scheme == 'https'
+            else http.client.HTTPConnection
+        )
+        return connection_class(self.url.hostname, self.url.port, timeout=60)
+
+    def run_client(self, paths, read_delay):
+        connection = self.connect()
+        for path in paths:
+            if time.monotonic() >= self.deadline:
+                break
+            start = time.perf_counter()
+            try:
+                connection.request('GET', path, headers=self.headers)
+                response = connection.getresponse()
+                while response.read(READ_CHUNK_SIZE):
+                    if read_delay:
+                        time.sleep(read_delay)
+                failed = response.status >= 400
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = self.connect()
+                failed = True
+            latency = (time.perf_counter() - start) * 1000
+            with self.lock:
+                if failed:
+                    self.errors[path] += 1
+                else:
+                    self.latencies[path].append(latency)
+        connection.close()
+
+    def compare(self, path, report):
+        with open(path, encoding='utf-8') as file:
+            baseline = json.load(file)
+        rows = [('total', baseline['total'], report['total'])] + [
+            (name, baseline['paths'][name], result)
+            for name, result in report['paths'].items()
+            if name in baseline['paths']
+        ]
+        for name, before, after in rows:
+            if not before.get('requests') or not after.get('requests'):
+                continue
+            self.stdout.write(
+                f'{name}: {before["rps"]:.1f} → {after["rps"]:.1f} rps, '
+                f'p95 {before["p95_ms"]:.1f} → {after["p95_ms"]:.1f} мс'
+            )
@@ -0,0 +1,76 @@
+import io
+import pstats
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import profiling
+from backend.constants import PROFILE_PRINT_LIMIT
+
+
+class Command(BaseCommand):
+    help = ('Выводит список сохранённых профилей запросов или профиль '
+            'с указанным идентификатором (latest — последний)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('profile_id', nargs='?')
+        parser.add_argument(
+            '--sort', default='cumulative',
+            choices=('cumulative', 'tottime', 'calls'),
+            help='Сортировка функций'
+        )
+        parser.add_argument(
+            '--limit', type=int, default=PROFILE_PRINT_LIMIT,
+            help='Сколько функций выводить'
+        )
+        parser.add_argument(
+            '--callees', action='store_true',
+            help='Вывести дерево вызовов для выбранных функций'
+        )
+
+    def handle(self, *args, **options):
+        profile_ids = profiling.list_ids()
+        if options['profile_id'] is None:
+            for profile_id in reversed(profile_ids):
+                meta, _ = profiling.load(profile_id)
+                self.stdout.write(
+                    '{id}  {method} {path}  {status}  {duration:.1f} мс  '
+                    'SQL: {queries} за {db:.1f} мс'.format(
+                        id=profile_id,
+                        method=meta['method'],
+                        path=meta['path'],
+                        status=meta['status'],
+                        duration=meta['duration_ms'],
+                        queries=len(meta['queries']),
+                        db=meta['db_ms']
+                    )
+                )
+            return
+        profile_id = options['profile_id']
+        if profile_id == 'latest' and profile_ids:
+            profile_id = profile_ids[-1]
+        if profile_id not in profile_ids:
+            raise CommandError(f'Профиль {profile_id} не найден')
+        meta, stats_path = profiling.load(profile_id)
+        self.stdout.write(
+            '{method} {path} → {status}, {created}, {duration:.1f} мс'.format(
+                method=meta['method'],
+                path=meta['path'],
+                status=meta['status'],
+                created=datetime.fromtimestamp(meta['created_at']),
+                duration=meta['duration_ms']
+            )
+        )
+        self.stdout.write(
+            f'SQL-запросов: {len(meta["queries"])}, {meta["db_ms"]:.1f} мс'
+        )
+        for number, query in enumerate(meta['queries'], 1):
+            self.stdout.write(
+                f'{number:>3}. {query["duration_ms"]:8.2f} мс  {query["sql"]}'
+            )
+        output = io.StringIO()
+        stats = pstats.Stats(str(stats_path), stream=output)
+        stats.sort_stats(options['sort']).print_stats(options['limit'])
+        if options['callees']:
+            stats.print_callees(options['limit'])
+        self.stdout.write(output.getvalue())
@@ -0,0 +1,221 @@
+"""Метрики запросов для Server-Timing и экспорта в формате Prometheus.
+
+Для каждого запроса считаются число SQL-запросов, время в БД, время
+сериализации и размер ответа, а для справочников — попадания в кэш.
+Гистограммы и счётчики хранятся в памяти процесса: при нескольких
+воркерах каждый отдаёт свои значения.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from rest_framework import serializers
+
+from backend.constants import (
+    METRICS_PREFIX,
+    METRICS_QUERY_BUCKETS,
+    METRICS_SIZE_BUCKETS,
+    METRICS_TIME_BUCKETS
+)
+
+current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    __slots__ = ('start', 'queries', 'db_time', 'serialize_time',
+                 'serializing')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.serializing = False
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+
+    def server_timing(self, total):
+        return ', '.join((
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"',
+            f'serialize;dur={self.serialize_time * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ))
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def samples(self):
+        total = 0
+        for bound, count in zip((*self.buckets, '+Inf'), self.counts):
+            total += count
+            yield bound, total
+
+
+HISTOGRAMS = {
+    'request_duration_seconds': ('Время обработки запроса',
+                                 METRICS_TIME_BUCKETS),
+    'request_db_seconds': ('Время SQL-запросов', METRICS_TIME_BUCKETS),
+    'request_serialize_seconds': ('Время сериализации без SQL',
+                                  METRICS_TIME_BUCKETS),
+    'request_queries': ('Число SQL-запросов', METRICS_QUERY_BUCKETS),
+    'response_bytes': ('Размер ответа', METRICS_SIZE_BUCKETS),
+}
+
+CATALOG_CACHE_RESULTS = ('hits', 'misses')
+
+lock = threading.Lock()
+routes = {}
+responses = {}
+catalog_requests = {}
+
+
+def get_route_histograms(route):
+    histograms = routes.get(route)
+    if histograms is None:
+        histograms = routes[route] = {
+            name: Histogram(buckets)
+            for name, (_, buckets) in HISTOGRAMS.items()
+        }
+    return histograms
+
+
+def observe(route, status, values):
+    """Добавляет замеры запроса; route — пара (имя представления, метод)."""
+    with lock:
+        histograms = get_route_histograms(route)
+        for name, value in values.items():
+            histograms[name].observe(value)
+        key = (*route, status)
+        responses[key] = responses.get(key, 0) + 1
+
+
+def observe_size(route, size):
+    with lock:
+        get_route_histograms(route)['response_bytes'].observe(size)
+
+
+def count_catalog_request(catalog, result):
+    """Учитывает попадание или промах кэша справочника."""
+    with lock:
+        key = (catalog, result)
+        catalog_requests[key] = catalog_requests.get(key, 0) + 1
+
+
+def get_catalog_stats(catalogs):
+    with lock:
+        return {
+            catalog: {
+                result: catalog_requests.get((catalog, result), 0)
+                for result in CATALOG_CACHE_RESULTS
+            }
+            for catalog in catalogs
+        }
+
+
+def format_labels(**labels):
+    return '{' + ','.join(
+        '{}="{}"'.format(
+            name,
+            str(value).replace('\\', r'\\').replace('"', r'\"')
+        )
+        for name, value in labels.items()
+    ) + '}'
+
+
+def export(counters=()):
+    """Текст в формате Prometheus.
+
+    counters — дополнительные счётчики: (имя, описание, [(метки, значение)]).
+    """
+    with lock:
+        snapshot = {
+            route: {
+                name: (list(histogram.samples()), histogram.sum)
+                for name, histogram in histograms.items()
+            }
+            for route, histograms in routes.items()
+        }
+        response_counts = dict(responses)
+    lines = [
+        f'# HELP {METRICS_PREFIX}_requests_total Число ответов',
+        f'# TYPE {METRICS_PREFIX}_requests_total counter',
+    ]
+    for (view, method, status), count in sorted(response_counts.items()):
+        labels = format_labels(view=view, method=method, status=status)
+        lines.append(f'{METRICS_PREFIX}_requests_total{labels} {count}')
+    for name, (description, _) in HISTOGRAMS.items():
+        metric = f'{METRICS_PREFIX}_{name}'
+        lines.append(f'# HELP {metric} {description}')
+        lines.append(f'# TYPE {metric} histogram')
+        for (view, method), histograms in sorted(snapshot.items()):
+            samples, total = histograms[name]
+            for bound, count in samples:
+                labels = format_labels(view=view, method=method, le=bound)
+                lines.append(f'{metric}_bucket{labels} {count}')
+            labels = format_labels(view=view, method=method)
+            lines.append(f'{metric}_sum{labels} {total}')
+            lines.append(f'{metric}_count{labels} {samples[-1][1]}')
+    for name, description, values in counters:
+        metric = f'{METRICS_PREFIX}_{name}'
+        lines.append(f'# HELP {metric} {description}')
+        lines.append(f'# TYPE {metric} counter')
+        for labels, value in values:
+            lines.append(f'{metric}{format_labels(**labels)} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    with lock:
+        routes.clear()
+        responses.clear()
+        catalog_requests.clear()
+
+
+def timed_data(data):
+    def get_data(serializer):
+        metrics = current.get()
+        if metrics is None or metrics.serializing:
+            return data.fget(serializer)
+        metrics.serializing = True
+        start = time.perf_counter()
+        db_time = metrics.db_time
+        try:
+            return data.fget(serializer)
+        finally:
+            metrics.serializing = False
+            metrics.serialize_time += (
+                time.perf_counter() - start - (metrics.db_time - db_time)
+            )
+
+    get_data.timed = True
+    return property(get_data)
+
+
+def instrument_serializers():
+    """Оборачивает свойство data сериализаторов DRF замером времени.
+
+    Учитывается только внешний вызов, вложенные сериализаторы входят в
+    него; время SQL-запросов во время сериализации вычитается.
+    """
+    for cls in (serializers.BaseSerializer, serializers.Serializer,
+                serializers.ListSerializer):
+        data = cls.__dict__['data']
+        if not getattr(data.fget, 'timed', False):
+            cls.data = timed_data(data)
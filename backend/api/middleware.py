@@ -0,0 +1,131 @@
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from rest_framework.exceptions import AuthenticationFailed
+
+from api import metrics, profiling
+from api.authentication import CachedTokenAuthentication
+from backend.constants import PROFILE_HEADER, PROFILE_QUERY_PARAM
+
+
+class MetricsMiddleware:
+    """Считает SQL-запросы и время обработки, добавляет Server-Timing.
+
+    Размер потокового ответа известен только после его отправки, поэтому
+    учитывается, когда клиент дочитал ответ; запросы к БД во время
+    отправки потока в замеры не попадают.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_metrics = metrics.RequestMetrics()
+        token = metrics.current.set(request_metrics)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(
+                        request_metrics.execute_wrapper
+                    ))
+                response = self.get_response(request)
+        finally:
+            metrics.current.reset(token)
+        total = time.perf_counter() - request_metrics.start
+        response['Server-Timing'] = request_metrics.server_timing(total)
+        match = request.resolver_match
+        route = (match.view_name if match else 'unmatched', request.method)
+        metrics.observe(route, response.status_code, {
+            'request_duration_seconds': total,
+            'request_db_seconds': request_metrics.db_time,
+            'request_serialize_seconds': request_metrics.serialize_time,
+            'request_queries': request_metrics.queries,
+        })
+        if response.streaming:
+            response.streaming_content = self.count_bytes(
+                route, response.streaming_content
+            )
+        else:
+            metrics.observe_size(route, len(response.content))
+        return response
+
+    @staticmethod
+    def count_bytes(route, chunks):
+        size = 0
+        try:
+            for chunk in chunks:
+                size += len(chunk)
+                yield chunk
+        finally:
+            metrics.observe_size(route, size)
+
+
+class ProfilingMiddleware:
+    """Профилирует запросы администраторов.
+
+    Запрос профилируется по параметру ?profile=1, заголовку X-Profile или
+    случайно с вероятностью PROFILE_SAMPLE_RATE. Идентификатор
+    сохранённого профиля возвращается в заголовке X-Profile-Id.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not self.is_requested(request) or not self.is_staff(request):
+            return self.get_response(request)
+        if not profiling.lock.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            return self.profile(request)
+        finally:
+            profiling.lock.release()
+
+    @staticmethod
+    def is_requested(request):
+        return (
+            PROFILE_QUERY_PARAM in request.GET
+            or PROFILE_HEADER in request.headers
+            or random.random() < settings.PROFILE_SAMPLE_RATE
+        )
+
+    @staticmethod
+    def is_staff(request):
+        if request.user.is_authenticated:
+            return request.user.is_staff
+        try:
+            user_token = CachedTokenAuthentication().authenticate(request)
+        except AuthenticationFailed:
+            return False
+        return user_token is not None and user_token[0].is_staff
+
+    def profile(self, request):
+        recorder = profiling.QueryRecorder()
+        profile = profiling.new_profile()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            profile.enable()
+            try:
+                response = self.get_response(request)
+                if response.streaming:
+                    response.streaming_content = [
+                        b''.join(response.streaming_content)
+                    ]
+            finally:
+                profile.disable()
+        duration = time.perf_counter() - start
+        response['X-Profile-Id'] = profiling.save(profile, {
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'created_at': time.time(),
+            'duration_ms': duration * 1000,
+            'db_ms': sum(query['duration_ms'] for query in recorder.queries),
+            'queries': recorder.queries,
+        })
+        return response
@@ -1,42 +1,226 @@
+import hashlib
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import connection, transaction
+from django.http import Http404, HttpResponse
 from rest_framework import status
 from rest_framework.exceptions import ValidationError
 from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
+from rest_framework.serializers import as_serializer_error
+
+from api.metrics import count_catalog_request
+from backend.constants import CATALOG_CACHE_KEY, CATALOG_CACHE_TIMEOUT
+from recipes.cache import get_catalog_version, touch_user_state
+
+
+class CatalogCacheMixin:
+    """Кэширование отрендеренных ответов справочника.
+
+    Байты ответа хранятся под ключом с версией каталога, которую сигналы
+    модели меняют при каждом сохранении и удалении, так что старые записи
+    просто перестают читаться. Ответ не зависит от пользователя, поэтому
+    кэшируются только форматы из cache_formats (браузерный API содержит
+    данные сессии).
+    """
+    cache_formats = ('json',)
+
+    def get_catalog(self):
+        return self.queryset.model._meta.model_name
+
+    def get_cached_response(self, handler, request, *args, **kwargs):
+        if request.accepted_renderer.format not in self.cache_formats:
+            return handler(request, *args, **kwargs)
+        catalog = self.get_catalog()
+        cache_key = CATALOG_CACHE_KEY.format(
+            catalog=catalog,
+            version=get_catalog_version(catalog),
+            format=request.accepted_renderer.format,
+            path=hashlib.md5(request.get_full_path().encode()).hexdigest()
+        )
+        cached = cache.get(cache_key)
+        if cached is not None:
+            count_catalog_request(catalog, 'hits')
+            content, content_type = cached
+            response = HttpResponse(content, content_type=content_type)
+            response['X-Cache'] = 'HIT'
+            return response
+        count_catalog_request(catalog, 'misses')
+        response = self.finalize_response(
+            request, handler(request, *args, **kwargs), *args, **kwargs
+        )
+        response.render()
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(
+                cache_key,
+                (response.content, response['Content-Type']),
+                CATALOG_CACHE_TIMEOUT
+            )
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+
+def insert_links(model, user_field_name, user_id,
+                 lookup_field_name, object_ids):
+    """Добавляет связи, пропуская существующие; возвращает id добавленных."""
+    if not object_ids:
+        return set()
+    user_column = model._meta.get_field(user_field_name).column
+    lookup_column = model._meta.get_field(lookup_field_name).column
+    quote_name = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote_name(model._meta.db_table)} '
+            f'({quote_name(user_column)}, {quote_name(lookup_column)}) '
+            f'VALUES {", ".join(["(%s, %s)"] * len(object_ids))} '
+            f'ON CONFLICT DO NOTHING RETURNING {quote_name(lookup_column)}',
+            [value for object_id in object_ids
+             for value in (user_id, object_id)]
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+
+def delete_links(model, user_field_name, user_id,
+                 lookup_field_name, object_ids):
+    """DELETE ... RETURNING; возвращает id объектов, связи с которыми были."""
+    if not object_ids:
+        return set()
+    user_column = model._meta.get_field(user_field_name).column
+    lookup_column = model._meta.get_field(lookup_field_name).column
+    quote_name = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {quote_name(model._meta.db_table)} '
+            f'WHERE {quote_name(user_column)} = %s '
+            f'AND {quote_name(lookup_column)} = ANY(%s) '
+            f'RETURNING {quote_name(lookup_column)}',
+            [user_id, list(object_ids)]
+        )
+        return {row[0] for row in cursor.fetchall()}
 
 
 class CreateDestroyM2MMixin:
+    """Создание и удаление связей пользователя с объектом.
+
+    Каждое переключение — не больше двух запросов: поиск объекта и
+    INSERT ... ON CONFLICT DO NOTHING при создании; DELETE и, только если
+    ничего не удалено, проверка существования объекта при удалении.
+    Запись идёт в обход сигналов модели связи, поэтому сопутствующие
+    изменения выполняют on_create и on_destroy: они вызываются как
+    hook(user_id, [object_id]) в той же транзакции.
+    """
+
     def create_m2m(self, read_serializer,
                    user_field_name, user_related_name, lookup_field_name,
-                   create_error_message):
-        serializer = self.get_serializer(data={
-            user_field_name: self.request.user.pk,
-            lookup_field_name: self.kwargs['pk']
-        })
-        serializer.is_valid(raise_exception=True)
-        if getattr(self.request.user, user_related_name).filter(
-                **{lookup_field_name: self.get_object()}
-        ).exists():
-            raise ValidationError(create_error_message)
+                   create_error_message, on_create=None):
+        serializer = self.get_serializer()
+        try:
+            obj = serializer.fields[lookup_field_name].run_validation(
+                self.kwargs['pk']
+            )
+        except ValidationError as error:
+            raise ValidationError({lookup_field_name: error.detail})
+        try:
+            serializer.validate({
+                user_field_name: self.request.user,
+                lookup_field_name: obj
+            })
+        except ValidationError as error:
+            raise ValidationError(as_serializer_error(error))
+        with transaction.atomic():
+            if not insert_links(
+                    getattr(self.request.user, user_related_name).model,
+                    user_field_name, self.request.user.pk,
+                    lookup_field_name, [obj.pk]
+            ):
+                raise ValidationError(create_error_message)
+            if on_create is not None:
+                on_create(self.request.user.pk, [obj.pk])
+        touch_user_state(self.request.user.pk)
         return Response(
-            read_serializer(
-                getattr(serializer.save(), lookup_field_name),
-                context={'request': self.request}
-            ).data,
+            read_serializer(obj, context={'request': self.request}).data,
             status=status.HTTP_201_CREATED
         )
 
     def destroy_m2m(self, user_related_name,
                     lookup_field_name, lookup_model,
-                    destroy_error_message):
-        obj = getattr(self.request.user, user_related_name).filter(
-            **{lookup_field_name: get_object_or_404(
-                lookup_model,
-                pk=self.kwargs['pk']
-            )}
-        )
-        if not obj.exists():
+                    destroy_error_message, on_destroy=None):
+        try:
+            pk = lookup_model._meta.pk.to_python(self.kwargs['pk'])
+        except DjangoValidationError:
+            raise Http404
+        related = getattr(self.request.user, user_related_name)
+        with transaction.atomic():
+            deleted = delete_links(
+                related.model, related.field.name, self.request.user.pk,
+                lookup_field_name, [pk]
+            )
+            if deleted and on_destroy is not None:
+                on_destroy(self.request.user.pk, [pk])
+        if not deleted:
+            get_object_or_404(lookup_model, pk=pk)
             raise ValidationError(destroy_error_message)
-        obj.delete()
+        touch_user_state(self.request.user.pk)
         return Response(
             status=status.HTTP_204_NO_CONTENT
         )
+
+    def bulk_m2m(self, user_related_name, lookup_field_name, lookup_model,
+                 on_create=None, on_destroy=None):
+        """Массовое создание (POST) или удаление (DELETE) связей по списку id.
+
+        Существование объектов проверяется одним запросом, запись — одним
+        INSERT или DELETE. В ответе — итог по каждому id: added,
+        already_added, removed, not_added или not_found.
+        """
+        serializer = self.get_serializer(data=self.request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = list(dict.fromkeys(serializer.validated_data['ids']))
+        user_id = self.request.user.pk
+        related = getattr(self.request.user, user_related_name)
+        with transaction.atomic():
+            if self.request.method == 'POST':
+                existing = set(lookup_model.objects.filter(
+                    pk__in=ids
+                ).values_list('pk', flat=True))
+                changed = insert_links(
+                    related.model, related.field.name, user_id,
+                    lookup_field_name, [pk for pk in ids if pk in existing]
+                )
+                hook, statuses = on_create, ('added', 'already_added')
+            else:
+                changed = delete_links(
+                    related.model, related.field.name, user_id,
+                    lookup_field_name, ids
+                )
+                unchanged = [pk for pk in ids if pk not in changed]
+                existing = changed | set(lookup_model.objects.filter(
+                    pk__in=unchanged
+                ).values_list('pk', flat=True) if unchanged else ())
+                hook, statuses = on_destroy, ('removed', 'not_added')
+            if changed and hook is not None:
+                hook(user_id, list(changed))
+        if changed:
+            touch_user_state(user_id)
+        return Response({'results': [
+            {
+                'id': pk,
+                'status': (
+                    statuses[0] if pk in changed
+                    else statuses[1] if pk in existing
+                    else 'not_found'
+                )
+            }
+            for pk in ids
+        ]})
@@ -1,8 +1,100 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (
+    BasePagination,
+    CursorPagination,
+    PageNumberPagination
+)
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
-from backend.constants import DEFAULT_PAGE_SIZE
+from backend.constants import DEFAULT_PAGE_SIZE, FEED_MAX_PAGE_SIZE
 
 
 class PageLimitPagination(PageNumberPagination):
     page_size_query_param = 'limit'
     page_size = DEFAULT_PAGE_SIZE
+
+
+class IdCursorPagination(CursorPagination):
+    page_size_query_param = 'limit'
+    page_size = DEFAULT_PAGE_SIZE
+    ordering = '-id'
+
+
+class PageLimitOrCursorPagination(PageLimitPagination):
+    """Постраничная пагинация или курсорная, если передан параметр cursor.
+
+    Курсорный режим включается запросом с пустым ?cursor= и не выполняет
+    COUNT(*); следующие страницы берутся из ссылок next/previous.
+    """
+    cursor_pagination_class = IdCursorPagination
+    cursor_paginator = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if (self.cursor_pagination_class.cursor_query_param
+                not in request.query_params):
+            return super().paginate_queryset(queryset, request, view)
+        self.cursor_paginator = self.cursor_pagination_class()
+        return self.cursor_paginator.paginate_queryset(
+            queryset, request, view
+        )
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is None:
+            return super().get_paginated_response(data)
+        return self.cursor_paginator.get_paginated_response(data)
+
+
+class FeedPagination(BasePagination):
+    """Курсорная пагинация ленты от новых рецептов к старым.
+
+    Курсор — id последнего рецепта страницы. Вместо queryset принимает
+    функцию load_page(before, limit), которая возвращает рецепты с id
+    меньше before по убыванию id.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    page_size = DEFAULT_PAGE_SIZE
+    max_page_size = FEED_MAX_PAGE_SIZE
+    invalid_cursor_message = 'Неверный курсор'
+
+    def paginate_queryset(self, load_page, request, view=None):
+        self.request = request
+        limit = self.get_page_size(request)
+        before = self.get_cursor(request)
+        page = list(load_page(before, limit + 1))
+        self.next_cursor = page[limit - 1].pk if len(page) > limit else None
+        return page[:limit]
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size < 1:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            before = int(cursor)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if before < 1:
+            raise NotFound(self.invalid_cursor_message)
+        return before
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.next_cursor
+        )
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
@@ -1,6 +1,20 @@
+from django.conf import settings
+from django.utils.crypto import constant_time_compare
 from rest_framework.permissions import BasePermission, SAFE_METHODS
 
 
 class IsAuthorOrReadOnly(BasePermission):
     def has_object_permission(self, request, view, obj):
         return request.method in SAFE_METHODS or request.user == obj.author
+
+
+class HasMetricsAccess(BasePermission):
+    """Токен METRICS_TOKEN в заголовке Authorization: Bearer или staff."""
+
+    def has_permission(self, request, view):
+        if request.user.is_staff:
+            return True
+        return bool(settings.METRICS_TOKEN) and constant_time_compare(
+            request.headers.get('Authorization', ''),
+            f'Bearer {settings.METRICS_TOKEN}'
+        )
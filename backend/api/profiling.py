@@ -0,0 +1,76 @@
+"""Профили запросов администраторов в кольцевом буфере на диске.
+
+Каждый профиль — пара файлов с общим именем: статистика cProfile
+(.prof, открывается pstats или snakeviz) и описание запроса со списком
+SQL-запросов (.json). Хранятся последние PROFILE_MAX_FILES профилей.
+"""
+import cProfile
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from django.conf import settings
+
+from backend.constants import PROFILE_MAX_FILES
+
+# cProfile нельзя запускать в нескольких потоках одновременно.
+lock = threading.Lock()
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'sql': sql,
+                'duration_ms': (time.perf_counter() - start) * 1000,
+            })
+
+
+def new_profile():
+    return cProfile.Profile()
+
+
+def get_directory():
+    directory = settings.PROFILE_DIR
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory
+
+
+def save(profile, meta):
+    """Сохраняет профиль и описание, удаляя самые старые сверх лимита."""
+    directory = get_directory()
+    profile_id = '{}-{}'.format(
+        datetime.now().strftime('%Y%m%d%H%M%S%f'), uuid.uuid4().hex[:8]
+    )
+    profile.dump_stats(directory / f'{profile_id}.prof')
+    with open(directory / f'{profile_id}.json', 'w',
+              encoding='utf-8') as file:
+        json.dump(meta, file, ensure_ascii=False, indent=2)
+    for stale in list_ids()[:-PROFILE_MAX_FILES]:
+        for suffix in ('.prof', '.json'):
+            try:
+                os.remove(directory / f'{stale}{suffix}')
+            except FileNotFoundError:
+                pass
+    return profile_id
+
+
+def list_ids():
+    """Идентификаторы профилей от старых к новым."""
+    return sorted(path.stem for path in get_directory().glob('*.json'))
+
+
+def load(profile_id):
+    directory = get_directory()
+    with open(directory / f'{profile_id}.json', encoding='utf-8') as file:
+        meta = json.load(file)
+    return meta, directory / f'{profile_id}.prof'
@@ -0,0 +1,117 @@
+import csv
+import io
+from abc import ABC, abstractmethod
+
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+from rest_framework.renderers import BaseRenderer
+
+SHOPPING_CART_TITLE = 'Список необходимых ингредиентов:'
+SHOPPING_CART_LINE = ('{ingredient__name} ({ingredient__measurement_unit}) '
+                      '- {total_amount}')
+
+
+class ShoppingCartRenderer(ABC, BaseRenderer):
+    """Рендерер списка покупок, отдающий файл частями.
+
+    На вход получает строки агрегата с ключами ingredient__name,
+    ingredient__measurement_unit и total_amount.
+    """
+    charset = 'utf-8'
+
+    @abstractmethod
+    def stream(self, ingredients):
+        """Возвращает итератор частей файла в байтах."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            return '\n'.join(
+                f'{key}: {value}' for key, value in data.items()
+            ).encode()
+        return b''.join(self.stream(data))
+
+
+class ShoppingCartTextRenderer(ShoppingCartRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream(self, ingredients):
+        yield SHOPPING_CART_TITLE.encode()
+        for ingredient in ingredients:
+            yield ('\n' + SHOPPING_CART_LINE.format(**ingredient)).encode()
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+class ShoppingCartCSVRenderer(ShoppingCartRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, ingredients):
+        writer = csv.writer(Echo())
+        yield writer.writerow(
+            ('Ингредиент', 'Единица измерения', 'Количество')
+        ).encode()
+        for ingredient in ingredients:
+            yield writer.writerow((
+                ingredient['ingredient__name'],
+                ingredient['ingredient__measurement_unit'],
+                ingredient['total_amount']
+            )).encode()
+
+
+class ShoppingCartPDFRenderer(ShoppingCartRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+    font_name = 'ShoppingCartFont'
+    font_size = 12
+    margin = 50
+
+    def get_font_name(self):
+        if self.font_name not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(
+                TTFont(self.font_name, settings.SHOPPING_CART_PDF_FONT)
+            )
+        return self.font_name
+
+    def stream(self, ingredients):
+        file = io.BytesIO()
+        width, height = A4
+        pdf = canvas.Canvas(file, pagesize=A4)
+        font_name = self.get_font_name()
+        line_height = self.font_size * 1.5
+        lines = [SHOPPING_CART_TITLE] + [
+            SHOPPING_CART_LINE.format(**ingredient)
+            for ingredient in ingredients
+        ]
+        y = height - self.margin
+        pdf.setFont(font_name, self.font_size)
+        for line in lines:
+            if y < self.margin:
+                pdf.showPage()
+                pdf.setFont(font_name, self.font_size)
+                y = height - self.margin
+            pdf.drawString(self.margin, y, line)
+            y -= line_height
+        pdf.save()
+        yield file.getvalue()
+
+
+class PrometheusRenderer(BaseRenderer):
+    media_type = 'text/plain'
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            return '\n'.join(
+                f'{key}: {value}' for key, value in data.items()
+            ).encode()
+        return data.encode()
@@ -1,20 +1,25 @@
+from django.db import transaction
 from djoser.serializers import UserSerializer
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 
 from backend.constants import (
+    BULK_IDS_LIMIT,
     MIN_AMOUNT_VALUE,
     MAX_AMOUNT_VALUE,
     MIN_COOKING_TIME_VALUE,
     MAX_COOKING_TIME_VALUE
 )
+from recipes import shopping_list
+from recipes.image_queue import enqueue
 from recipes.models import (
     Tag,
     Ingredient,
     IngredientToRecipe,
     Recipe,
     Favorite,
+    ImageStatus,
     ShoppingCart,
 )
 from users.models import Follow, CustomUser
@@ -31,6 +36,8 @@ class CustomUserSerializer(UserSerializer):
         )
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         user = self.context['request'].user
         return user.is_authenticated and user.follower.filter(
             author=obj
@@ -77,26 +84,34 @@ class RecipeReadSerializer(serializers.ModelSerializer):
     class Meta:
         model = Recipe
         fields = ('id', 'tags', 'author', 'ingredients', 'is_favorited',
-                  'is_in_shopping_cart', 'name', 'image', 'text',
+                  'is_in_shopping_cart', 'name', 'image', 'image_webp',
+                  'thumbnail', 'thumbnail_webp', 'image_status', 'text',
                   'cooking_time')
 
-    def get_user(self):
-        return self.context['request'].user
-
     def get_is_favorited(self, obj):
-        user = self.get_user()
-        return user.is_authenticated and user.favorites.filter(
-            recipe=obj
-        ).exists()
+        return getattr(obj, 'is_favorited', False)
 
     def get_is_in_shopping_cart(self, obj):
-        user = self.get_user()
-        return user.is_authenticated and user.shopping_carts.filter(
-            recipe=obj
-        ).exists()
+        return getattr(obj, 'is_in_shopping_cart', False)
+
+
+def get_objects(queryset, primary_keys, error_message):
+    """Загружает объекты по списку ключей одним IN-запросом.
+
+    Сообщает сразу обо всех несуществующих ключах; порядок объектов
+    совпадает с порядком ключей.
+    """
+    objects = queryset.in_bulk(primary_keys)
+    missing = [pk for pk in dict.fromkeys(primary_keys) if pk not in objects]
+    if missing:
+        raise ValidationError(
+            error_message.format(', '.join(map(str, missing)))
+        )
+    return [objects[pk] for pk in primary_keys]
 
 
 class IngredientToRecipeWriteSerializer(IngredientToRecipeSerializer):
+    id = serializers.IntegerField(source='ingredient.id')
     amount = serializers.IntegerField(
         min_value=MIN_AMOUNT_VALUE,
         max_value=MAX_AMOUNT_VALUE
@@ -109,6 +124,7 @@ class IngredientToRecipeWriteSerializer(IngredientToRecipeSerializer):
 
 class RecipeWriteSerializer(serializers.ModelSerializer):
     ingredients = IngredientToRecipeWriteSerializer(many=True)
+    tags = serializers.ListField(child=serializers.IntegerField())
     image = Base64ImageField()
     cooking_time = serializers.IntegerField(
         min_value=MIN_COOKING_TIME_VALUE,
@@ -125,7 +141,9 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
             raise ValidationError('Поле тегов не может быть пустым')
         if len(value) != len(set(value)):
             raise ValidationError('Теги не могут повторяться')
-        return value
+        return get_objects(
+            Tag.objects.all(), value, 'Теги не существуют: {}'
+        )
 
     def validate_ingredients(self, value):
         if not value:
@@ -136,6 +154,13 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         ]
         if len(primary_keys) != len(set(primary_keys)):
             raise ValidationError('Ингредиенты не могут повторяться')
+        ingredients = get_objects(
+            Ingredient.objects.all(),
+            primary_keys,
+            'Ингредиенты не существуют: {}'
+        )
+        for ingredient_data, ingredient in zip(value, ingredients):
+            ingredient_data['ingredient']['id'] = ingredient
         return value
 
     def add_ingredients(self, recipe, ingredients_data):
@@ -150,34 +175,79 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
             )
         IngredientToRecipe.objects.bulk_create(ingredients_to_recipe)
 
+    @transaction.atomic
     def create(self, validated_data):
         tags = validated_data.pop('tags')
         ingredients_data = validated_data.pop('ingredients')
+        validated_data['image_status'] = ImageStatus.PROCESSING
         recipe = super().create(validated_data)
         recipe.tags.set(tags)
         self.add_ingredients(recipe, ingredients_data)
+        enqueue(recipe)
         return recipe
 
+    def update_ingredients(self, recipe, ingredients_data):
+        """Приводит состав рецепта к переданному минимальным числом запросов.
+
+        Возвращает старые и новые количества {ingredient_id: amount}.
+        """
+        rows = {
+            row.ingredient_id: row
+            for row in recipe.ingredients_to_recipes.all()
+        }
+        old_amounts = {
+            ingredient_id: row.amount for ingredient_id, row in rows.items()
+        }
+        new_amounts = {
+            ingredient_data['ingredient']['id'].pk: ingredient_data['amount']
+            for ingredient_data in ingredients_data
+        }
+        removed = [
+            row.pk for ingredient_id, row in rows.items()
+            if ingredient_id not in new_amounts
+        ]
+        if removed:
+            IngredientToRecipe.objects.filter(pk__in=removed).delete()
+        changed = []
+        for ingredient_id, row in rows.items():
+            amount = new_amounts.get(ingredient_id, row.amount)
+            if amount != row.amount:
+                row.amount = amount
+                changed.append(row)
+        if changed:
+            IngredientToRecipe.objects.bulk_update(changed, ('amount',))
+        self.add_ingredients(recipe, [
+            ingredient_data for ingredient_data in ingredients_data
+            if ingredient_data['ingredient']['id'].pk not in rows
+        ])
+        return old_amounts, new_amounts
+
+    @transaction.atomic
     def update(self, instance, validated_data):
         tags = validated_data.pop('tags')
         ingredients_data = validated_data.pop('ingredients')
+        if 'image' in validated_data:
+            validated_data['image_status'] = ImageStatus.PROCESSING
         recipe = super().update(instance, validated_data)
-        recipe.tags.clear()
         recipe.tags.set(tags)
-        recipe.ingredients_to_recipes.all().delete()
-        self.add_ingredients(recipe, ingredients_data)
+        shopping_list.change_recipe_amounts(
+            recipe.pk, *self.update_ingredients(recipe, ingredients_data)
+        )
+        if 'image' in validated_data:
+            enqueue(recipe)
         return recipe
 
 
 class ShortRecipeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_webp', 'thumbnail',
+                  'thumbnail_webp', 'image_status', 'cooking_time')
 
 
 class FollowUserSerializer(CustomUserSerializer):
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
+    recipes_count = serializers.ReadOnlyField()
 
     class Meta:
         model = CustomUser
@@ -185,6 +255,8 @@ class FollowUserSerializer(CustomUserSerializer):
                   'is_subscribed', 'recipes', 'recipes_count')
 
     def get_recipes(self, obj):
+        if hasattr(obj, 'recipe_previews'):
+            return ShortRecipeSerializer(obj.recipe_previews, many=True).data
         recipes_limit = self.context['request'].query_params.get(
             'recipes_limit'
         )
@@ -193,9 +265,6 @@ class FollowUserSerializer(CustomUserSerializer):
             recipes = recipes[:int(recipes_limit)]
         return ShortRecipeSerializer(recipes, many=True).data
 
-    def get_recipes_count(self, obj):
-        return obj.recipes.all().count()
-
 
 class FollowSerializer(serializers.ModelSerializer):
     class Meta:
@@ -218,3 +287,11 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
     class Meta:
         model = ShoppingCart
         fields = '__all__'
+
+
+class BulkIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BULK_IDS_LIMIT
+    )
@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.base.base import BaseDatabaseWrapper
+from django.dispatch import receiver
+
+
+def checked_ensure_connection(ensure_connection):
+    def wrapper(self):
+        # Вне autocommit проверочный SELECT открыл бы транзакцию, а внутри
+        # atomic закрытие соединения оборвало бы её: проверка ждёт.
+        if (getattr(self, 'health_check_pending', False)
+                and self.connection is not None
+                and self.autocommit and not self.in_atomic_block):
+            self.health_check_pending = False
+            if not self.is_usable():
+                self.close()
+        ensure_connection(self)
+
+    wrapper.health_checked = True
+    return wrapper
+
+
+def instrument_connections():
+    """Добавляет отложенную проверку соединения перед первым запросом.
+
+    Замена CONN_HEALTH_CHECKS из Django 4.1: соединение, помеченное в
+    начале запроса, проверяется только при первом обращении к курсору,
+    поэтому запросы без обращения к БД не платят лишний SELECT 1.
+    """
+    ensure_connection = BaseDatabaseWrapper.ensure_connection
+    if not getattr(ensure_connection, 'health_checked', False):
+        BaseDatabaseWrapper.ensure_connection = checked_ensure_connection(
+            ensure_connection
+        )
+
+
+@receiver(request_started)
+def check_db_connections(**kwargs):
+    """Помечает постоянные соединения для проверки при первом запросе.
+
+    Без проверки запрос после перезапуска БД получил бы ошибку на
+    сохранённом соединении.
+    """
+    if not settings.DB_HEALTH_CHECKS:
+        return
+    for connection in connections.all():
+        if connection.connection is not None:
+            connection.health_check_pending = True
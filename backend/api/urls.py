@@ -5,7 +5,8 @@ from .views import (
     TagViewSet,
     IngredientViewSet,
     RecipeViewSet,
-    CustomUserViewSet
+    CustomUserViewSet,
+    MetricsView
 )
 
 router = SimpleRouter()
@@ -18,4 +19,5 @@ router.register('users', CustomUserViewSet, basename='users')
 urlpatterns = [
     path('', include(router.urls)),
     path('auth/', include('djoser.urls.authtoken')),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
 ]
@@ -1,21 +1,44 @@
-from django.core.files.base import ContentFile
-from django.db.models import Sum
-from django.http import FileResponse
+import hashlib
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db.models import (
+    BooleanField,
+    Exists,
+    Max,
+    OuterRef,
+    Prefetch,
+    Value
+)
+from django.http import StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
-from rest_framework import status
+from rest_framework import serializers, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import (
     IsAuthenticated,
     IsAuthenticatedOrReadOnly
 )
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 
+from api import metrics
 from api.filters import IngredientFilterSet, RecipeFilterSet
-from api.mixins import CreateDestroyM2MMixin
-from api.permissions import IsAuthorOrReadOnly
+from api.mixins import CatalogCacheMixin, CreateDestroyM2MMixin
+from api.pagination import FeedPagination, PageLimitOrCursorPagination
+from api.permissions import HasMetricsAccess, IsAuthorOrReadOnly
+from api.renderers import (
+    PrometheusRenderer,
+    ShoppingCartCSVRenderer,
+    ShoppingCartPDFRenderer,
+    ShoppingCartTextRenderer
+)
 from api.serializers import (
+    BulkIdsSerializer,
     TagSerializer,
     ShoppingCartSerializer,
     IngredientSerializer,
@@ -26,46 +49,195 @@ from api.serializers import (
     ShortRecipeSerializer,
     FollowUserSerializer
 )
+from backend.constants import (
+    INGREDIENT_SEARCH_LIMIT,
+    SHOPPING_CART_CACHE_KEY,
+    SHOPPING_CART_CACHE_TIMEOUT
+)
+from recipes.cache import (
+    get_recipes_state,
+    get_shopping_cart_version,
+    get_user_state
+)
+from recipes import counters, feed, shopping_list
+from recipes.ingredient_index import ingredient_index
 from recipes.models import (
     Tag,
     Ingredient,
     Recipe,
-    IngredientToRecipe
+    IngredientToRecipe,
+    Favorite,
+    ShoppingCart,
+    ShoppingListItem
 )
-from users.models import CustomUser
+from users.models import CustomUser, Follow
 
 
-class TagViewSet(ReadOnlyModelViewSet):
+class TagViewSet(CatalogCacheMixin, ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
 
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+class IngredientViewSet(CatalogCacheMixin, ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     pagination_class = None
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilterSet
 
+    def get_limit(self):
+        limit = self.request.query_params.get('limit')
+        if not limit:
+            return None
+        try:
+            return serializers.IntegerField(min_value=1).run_validation(limit)
+        except ValidationError as error:
+            raise ValidationError({'limit': error.detail})
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(self.get_list_response, request)
+
+    def get_list_response(self, request):
+        if 'search' not in request.query_params:
+            return Response(ingredient_index.search(
+                request.query_params.get('name', ''), self.get_limit()
+            ))
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(self.get_serializer(
+            queryset[:self.get_limit() or INGREDIENT_SEARCH_LIMIT], many=True
+        ).data)
+
 
 class RecipeViewSet(ModelViewSet, CreateDestroyM2MMixin):
     http_method_names = ('get', 'post', 'patch', 'delete')
     queryset = Recipe.objects.all()
     serializer_class = RecipeReadSerializer
     permission_classes = (IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly)
+    pagination_class = PageLimitOrCursorPagination
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilterSet
 
+    def get_queryset(self):
+        if self.action in ('list', 'retrieve'):
+            return self.get_read_queryset()
+        return super().get_queryset()
+
+    def get_read_queryset(self):
+        queryset = super().get_queryset().prefetch_related(
+            'tags',
+            Prefetch(
+                'ingredients_to_recipes',
+                queryset=IngredientToRecipe.objects.select_related(
+                    'ingredient'
+                ).order_by('ingredient__name')
+            )
+        )
+        user = self.request.user
+        if not user.is_authenticated:
+            return queryset.select_related('author')
+        return self.annotate_user_flags(queryset.prefetch_related(
+            Prefetch(
+                'author',
+                queryset=CustomUser.objects.annotate(
+                    is_subscribed=Exists(Follow.objects.filter(
+                        follower=user, author=OuterRef('pk')
+                    ))
+                )
+            )
+        ))
+
+    def annotate_user_flags(self, queryset):
+        user = self.request.user
+        if not user.is_authenticated:
+            return queryset
+        return queryset.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            ))
+        )
+
+    def get_conditional_response(self, key, recipes_state, updated_at,
+                                 get_response):
+        """Отвечает 304 по If-None-Match/If-Modified-Since без сериализации.
+
+        Валидаторы строятся из updated_at рецептов, времени последнего
+        удаления рецепта и времени изменения избранного, корзины и
+        подписок текущего пользователя.
+        """
+        user = self.request.user
+        last_modified = max(
+            updated_at.timestamp() if updated_at else 0, recipes_state
+        )
+        user_state = 0
+        if user.is_authenticated:
+            user_state = get_user_state(user.pk)
+            last_modified = max(last_modified, user_state)
+        etag = 'W/"{}"'.format(hashlib.md5(':'.join(map(str, (
+            key, self.request.accepted_renderer.format,
+            recipes_state, updated_at, user.pk, user_state
+        ))).encode()).hexdigest())
+        # HTTP-дата хранит целые секунды: с дробной частью время всегда
+        # оказывалось бы позже If-Modified-Since.
+        last_modified = int(last_modified)
+        response = get_conditional_response(
+            self.request._request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = get_response()
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        # Индексный Max(updated_at) по всем рецептам вместо агрегата по
+        # отфильтрованной выборке: фильтры входят в ключ через строку
+        # запроса, а удаления — через время последнего удаления рецепта.
+        return self.get_conditional_response(
+            request.get_full_path(),
+            get_recipes_state(),
+            Recipe.objects.aggregate(
+                updated_at=Max('updated_at')
+            )['updated_at'],
+            lambda: super(RecipeViewSet, self).list(request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            updated_at = Recipe.objects.filter(
+                pk=kwargs['pk']
+            ).values_list('updated_at', flat=True).first()
+        except (TypeError, ValueError):
+            updated_at = None
+        if updated_at is None:
+            return super().retrieve(request, *args, **kwargs)
+        return self.get_conditional_response(
+            request.get_full_path(),
+            0,
+            updated_at,
+            lambda: super(RecipeViewSet, self).retrieve(
+                request, *args, **kwargs
+            )
+        )
+
+    def get_read_response(self, recipe, status_code=status.HTTP_200_OK):
+        return Response(
+            self.get_serializer(
+                self.get_read_queryset().get(pk=recipe.pk)
+            ).data,
+            status=status_code
+        )
+
     def create(self, request, *args, **kwargs):
         serializer = RecipeWriteSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        read_serializer = self.get_serializer(
-            serializer.save(
-                author=request.user
-            )
+        return self.get_read_response(
+            serializer.save(author=request.user),
+            status_code=status.HTTP_201_CREATED
         )
-        return Response(read_serializer.data, status=status.HTTP_201_CREATED)
 
     def update(self, request, *args, **kwargs):
         serializer = RecipeWriteSerializer(
@@ -73,10 +245,20 @@ class RecipeViewSet(ModelViewSet, CreateDestroyM2MMixin):
             data=request.data
         )
         serializer.is_valid(raise_exception=True)
-        read_serializer = self.get_serializer(
-            serializer.save()
+        return self.get_read_response(serializer.save())
+
+    @action(detail=False, pagination_class=FeedPagination,
+            methods=('GET',), permission_classes=(IsAuthenticated,))
+    def feed(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.load_feed_page)
+        return self.get_paginated_response(
+            self.get_serializer(page, many=True).data
         )
-        return Response(read_serializer.data)
+
+    def load_feed_page(self, before, limit):
+        return self.get_read_queryset().filter(
+            pk__in=feed.get_recipe_ids(self.request.user.pk, before, limit)
+        ).order_by('-pk')
 
     @action(detail=True, serializer_class=ShoppingCartSerializer,
             methods=('POST', 'DELETE'), permission_classes=(IsAuthenticated,))
@@ -88,39 +270,70 @@ class RecipeViewSet(ModelViewSet, CreateDestroyM2MMixin):
                 'shopping_carts',
                 'recipe',
                 'Рецепт уже находится в корзине',
+                on_create=shopping_list.add_recipes
             )
         return self.destroy_m2m(
             'shopping_carts',
             'recipe',
             Recipe,
-            'Рецепт не находится в корзине'
+            'Рецепт не находится в корзине',
+            on_destroy=shopping_list.remove_recipes
+        )
+
+    @action(detail=False, url_path='shopping_cart',
+            serializer_class=BulkIdsSerializer,
+            methods=('POST', 'DELETE'), permission_classes=(IsAuthenticated,))
+    def shopping_cart_bulk(self, request, *args, **kwargs):
+        return self.bulk_m2m(
+            'shopping_carts',
+            'recipe',
+            Recipe,
+            on_create=shopping_list.add_recipes,
+            on_destroy=shopping_list.remove_recipes
         )
 
     @action(detail=False, serializer_class=ShoppingCartSerializer,
+            renderer_classes=(
+                ShoppingCartTextRenderer,
+                ShoppingCartCSVRenderer,
+                ShoppingCartPDFRenderer
+            ),
             methods=('GET',), permission_classes=(IsAuthenticated,))
     def download_shopping_cart(self, request, *args, **kwargs):
-        ingredients_data = IngredientToRecipe.objects.filter(
-            recipe__shopping_carts__user=request.user
-        ).values(
-            'amount',
-            'ingredient__name',
-            'ingredient__measurement_unit',
-        ).annotate(
-            total_amount=Sum('amount')
-        )
-        strings = ['Список необходимых ингредиентов:']
-        for ingredient_data in ingredients_data:
-            strings.append(
-                '{ingredient__name} ({ingredient__measurement_unit}) '
-                '- {total_amount}'.format(
-                    **ingredient_data
-                )
-            )
-        return FileResponse(
-            ContentFile('\n'.join(strings).encode()),
-            as_attachment=True,
-            filename='ingredients.txt'
+        renderer = request.accepted_renderer
+        cache_key = SHOPPING_CART_CACHE_KEY.format(
+            user_id=request.user.pk,
+            version=get_shopping_cart_version(request.user.pk),
+            format=renderer.format
         )
+        content = cache.get(cache_key)
+        if content is None:
+            chunks = self.cache_chunks(cache_key, renderer.stream(
+                ShoppingListItem.objects.filter(
+                    user=request.user
+                ).values(
+                    'ingredient__name',
+                    'ingredient__measurement_unit',
+                    'total_amount'
+                ).iterator()
+            ))
+        else:
+            chunks = (content,)
+        response = StreamingHttpResponse(
+            chunks, content_type=renderer.media_type
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="ingredients.{renderer.format}"'
+        )
+        return response
+
+    @staticmethod
+    def cache_chunks(cache_key, chunks):
+        content = []
+        for chunk in chunks:
+            content.append(chunk)
+            yield chunk
+        cache.set(cache_key, b''.join(content), SHOPPING_CART_CACHE_TIMEOUT)
 
     @action(detail=True, serializer_class=FavoriteSerializer,
             methods=('POST', 'DELETE'), permission_classes=(IsAuthenticated,))
@@ -132,12 +345,26 @@ class RecipeViewSet(ModelViewSet, CreateDestroyM2MMixin):
                 'favorites',
                 'recipe',
                 'Рецепт уже находится в избранном',
+                on_create=counters.add_favorites
             )
         return self.destroy_m2m(
             'favorites',
             'recipe',
             Recipe,
-            'Рецепт не находится в избранном'
+            'Рецепт не находится в избранном',
+            on_destroy=counters.remove_favorites
+        )
+
+    @action(detail=False, url_path='favorite',
+            serializer_class=BulkIdsSerializer,
+            methods=('POST', 'DELETE'), permission_classes=(IsAuthenticated,))
+    def favorite_bulk(self, request, *args, **kwargs):
+        return self.bulk_m2m(
+            'favorites',
+            'recipe',
+            Recipe,
+            on_create=counters.add_favorites,
+            on_destroy=counters.remove_favorites
         )
 
 
@@ -153,7 +380,9 @@ class CustomUserViewSet(UserViewSet, CreateDestroyM2MMixin):
         if self.action == 'subscriptions':
             return CustomUser.objects.filter(
                 following__follower=self.request.user
-            )
+            ).annotate(
+                is_subscribed=Value(True, output_field=BooleanField())
+            ).order_by('last_name', 'pk')
         return super().get_queryset()
 
     @action(detail=True, serializer_class=FollowSerializer,
@@ -166,16 +395,55 @@ class CustomUserViewSet(UserViewSet, CreateDestroyM2MMixin):
                 'follower',
                 'follower',
                 'author',
-                'Вы уже подписаны на этого автора'
+                'Вы уже подписаны на этого автора',
+                on_create=feed.add_authors
             )
         return self.destroy_m2m(
             'follower',
             'author',
             CustomUser,
-            'Вы ещё не подписаны на этого автора'
+            'Вы ещё не подписаны на этого автора',
+            on_destroy=feed.remove_authors
         )
 
     @action(detail=False, serializer_class=FollowUserSerializer,
+            pagination_class=PageLimitOrCursorPagination,
             methods=('GET',), permission_classes=(IsAuthenticated,))
     def subscriptions(self, request, *args, **kwargs):
-        return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        authors = list(queryset) if page is None else page
+        recipes_limit = request.query_params.get('recipes_limit')
+        previews = defaultdict(list)
+        for recipe in Recipe.objects.previews_for_authors(
+                [author.pk for author in authors],
+                int(recipes_limit) if recipes_limit else None
+        ):
+            previews[recipe.author_id].append(recipe)
+        for author in authors:
+            author.recipe_previews = previews[author.pk]
+        serializer = self.get_serializer(authors, many=True)
+        if page is None:
+            return Response(serializer.data)
+        return self.get_paginated_response(serializer.data)
+
+
+class MetricsView(APIView):
+    permission_classes = (HasMetricsAccess,)
+    renderer_classes = (PrometheusRenderer,)
+
+    def get(self, request):
+        stats = metrics.get_catalog_stats(
+            [model._meta.model_name for model in (Tag, Ingredient)]
+        )
+        return Response(metrics.export((
+            (
+                'catalog_cache_requests_total',
+                'Обращения к кэшу справочников',
+                [
+                    ({'catalog': catalog, 'result': result}, values[result])
+                    for catalog, values in stats.items()
+                    for result in metrics.CATALOG_CACHE_RESULTS
+                ]
+            ),
+        )))
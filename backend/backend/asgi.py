@@ -9,8 +9,12 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
-application = get_asgi_application()
+django.setup(set_prefix=False)
+
+from backend.handlers import ThreadPoolASGIHandler  # noqa: E402
+
+application = ThreadPoolASGIHandler()
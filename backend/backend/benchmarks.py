@@ -0,0 +1,43 @@
+"""Общие средства замеров: запросы к API в транзакции, которая затем
+откатывается."""
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.test.utils import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+# Кэш отключается, чтобы замерять построение ответа, а не чтение из кэша.
+NO_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+}
+# Кэш в памяти процесса работает как боевой, но исчезает вместе с
+# откатом транзакции и не оставляет версий и счётчиков в общем кэше.
+LOCAL_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+}
+
+
+class Rollback(Exception):
+    pass
+
+
+@contextmanager
+def rolled_back(**settings):
+    """Выполняет блок с переопределёнными настройками и откатывает все
+    изменения в базе."""
+    with override_settings(**settings):
+        try:
+            with transaction.atomic():
+                yield
+                raise Rollback
+        except Rollback:
+            pass
+
+
+def make_request(method, path, data=None, user=None):
+    request = getattr(APIRequestFactory(), method)(
+        path, data, format=None if method == 'get' else 'json'
+    )
+    if user is not None:
+        force_authenticate(request, user)
+    return request
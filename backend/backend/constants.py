@@ -8,3 +8,35 @@ MIN_AMOUNT_VALUE = 1
 MAX_AMOUNT_VALUE = 32000
 MIN_COOKING_TIME_VALUE = 1
 MAX_COOKING_TIME_VALUE = 32000
+INGREDIENT_INDEX_TTL = 300
+INGREDIENT_SEARCH_LIMIT = 20
+SHOPPING_CART_VERSION_KEY = 'shopping_cart_version:{user_id}'
+SHOPPING_CART_CACHE_KEY = 'shopping_cart:{user_id}:{version}:{format}'
+SHOPPING_CART_CACHE_TIMEOUT = 60 * 60 * 24
+USER_STATE_KEY = 'user_state:{user_id}'
+CATALOG_VERSION_KEY = 'catalog_version:{catalog}'
+RECIPES_STATE_KEY = 'recipes_state'
+CATALOG_CACHE_KEY = 'catalog:{catalog}:{version}:{format}:{path}'
+CATALOG_CACHE_TIMEOUT = 60 * 60 * 24
+AUTH_TOKEN_CACHE_KEY = 'auth_token:{key}'
+AUTH_TOKEN_CACHE_TIMEOUT = 60
+THUMBNAIL_SIZE = (320, 320)
+JPEG_QUALITY = 85
+WEBP_QUALITY = 80
+IMAGE_MAX_SIZE = (1920, 1920)
+IMAGE_JOB_MAX_ATTEMPTS = 3
+IMAGE_JOB_TIMEOUT = 60 * 10
+IMAGE_JOB_BATCH_SIZE = 16
+IMAGE_JOB_POLL_INTERVAL = 2
+BULK_IDS_LIMIT = 100
+METRICS_TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+METRICS_QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+METRICS_SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+METRICS_PREFIX = 'foodgram'
+PROFILE_QUERY_PARAM = 'profile'
+PROFILE_HEADER = 'X-Profile'
+PROFILE_MAX_FILES = 50
+PROFILE_PRINT_LIMIT = 40
+FEED_FANOUT_LIMIT = 1000
+FEED_BACKFILL_LIMIT = 100
+FEED_MAX_PAGE_SIZE = 100
@@ -0,0 +1,69 @@
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core import signals
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.base import BaseHandler
+from django.core.exceptions import RequestAborted
+from django.http import FileResponse
+from django.urls import set_script_prefix
+
+
+class ThreadPoolASGIHandler(ASGIHandler):
+    """ASGI-обработчик с ограниченным пулом потоков для синхронного кода.
+
+    В Django 3.2 синхронные представления под ASGI выполняются в одном
+    общем потоке. Здесь запрос целиком (сигналы, middleware, представление,
+    чтение потокового ответа) выполняется в одном из ASGI_THREADS потоков.
+    У каждого потока своё постоянное соединение с БД, поэтому соединений
+    не больше размера пула. Готовый ответ отправляется из цикла событий,
+    и медленный клиент не занимает поток.
+    """
+
+    def __init__(self):
+        # Цепочка middleware синхронная: она целиком выполняется в пуле.
+        BaseHandler.__init__(self)
+        self.load_middleware()
+        self.executor = ThreadPoolExecutor(
+            max_workers=settings.ASGI_THREADS,
+            thread_name_prefix='asgi-orm'
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            raise ValueError(
+                'Django can only handle ASGI/HTTP connections, not %s.'
+                % scope['type']
+            )
+        try:
+            body_file = await self.read_body(receive)
+        except RequestAborted:
+            return
+        response = await asyncio.get_running_loop().run_in_executor(
+            self.executor,
+            contextvars.copy_context().run,
+            self.get_response_in_thread,
+            scope,
+            body_file
+        )
+        await self.send_response(response, send)
+
+    def get_response_in_thread(self, scope, body_file):
+        set_script_prefix(self.get_script_prefix(scope))
+        signals.request_started.send(sender=self.__class__, scope=scope)
+        request, response = self.create_request(scope, body_file)
+        if request is not None:
+            response = self.get_response(request)
+        response._handler_class = self.__class__
+        if isinstance(response, FileResponse):
+            response.block_size = self.chunk_size
+            return response
+        if response.streaming:
+            response.streaming_content = list(response)
+        # request_finished закрывает соединения этого потока, поэтому
+        # ответ закрывается здесь, а не после отправки.
+        response.close()
+        response.close = lambda: None
+        return response
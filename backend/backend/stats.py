@@ -0,0 +1,25 @@
+"""Сводная статистика выборок для метрик и замеров."""
+from statistics import mean, quantiles
+
+
+def summarize(values, unit=None):
+    """Среднее, перцентили и максимум выборки.
+
+    Перцентили считаются с интерполяцией (method='inclusive'); unit
+    добавляется суффиксом к ключам.
+    """
+    if not values:
+        return None
+    points = (
+        quantiles(values, n=100, method='inclusive')
+        if len(values) > 1 else list(values) * 99
+    )
+    suffix = f'_{unit}' if unit else ''
+    return {
+        'count': len(values),
+        f'mean{suffix}': mean(values),
+        f'p50{suffix}': points[49],
+        f'p95{suffix}': points[94],
+        f'p99{suffix}': points[98],
+        f'max{suffix}': max(values),
+    }
@@ -1,12 +1,21 @@
+from collections import defaultdict
+
 from django.contrib import admin
+from django.db import transaction
 
+from . import counters, shopping_list
+from .cache import touch_user_state
+from .image_queue import enqueue
 from .models import (
+    ImageJob,
+    ImageStatus,
     Ingredient,
     Recipe,
     Tag,
     IngredientToRecipe,
     Favorite,
-    ShoppingCart
+    ShoppingCart,
+    ShoppingListItem
 )
 
 
@@ -19,10 +28,33 @@ class IngredientToRecipeInline(admin.TabularInline):
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
     inlines = [IngredientToRecipeInline]
-    list_display = ['name', 'author', 'cooking_time']
-    list_filter = ['tags', 'author']
+    list_display = ['name', 'author', 'cooking_time', 'favorites_count',
+                    'image_status']
+    readonly_fields = ['favorites_count', 'image_status']
+    list_filter = ['tags', 'author', 'image_status']
     search_fields = ['name', 'text', 'author__username']
 
+    def save_model(self, request, obj, form, change):
+        if 'image' in form.changed_data:
+            obj.image_status = ImageStatus.PROCESSING
+        super().save_model(request, obj, form, change)
+        if 'image' in form.changed_data:
+            enqueue(obj)
+
+    def save_related(self, request, form, formsets, change):
+        # Состав рецепта из инлайна переносится в списки покупок так же,
+        # как при обновлении через API.
+        recipe_ids = (form.instance.pk,)
+        old_amounts = (
+            shopping_list.get_recipe_amounts(recipe_ids) if change else {}
+        )
+        super().save_related(request, form, formsets, change)
+        if change:
+            shopping_list.change_recipe_amounts(
+                form.instance.pk, old_amounts,
+                shopping_list.get_recipe_amounts(recipe_ids)
+            )
+
 
 @admin.register(Tag)
 class TagAdmin(admin.ModelAdmin):
@@ -38,8 +70,72 @@ class IngredientAdmin(admin.ModelAdmin):
     list_filter = ['measurement_unit']
 
 
-@admin.register(Favorite)
-@admin.register(ShoppingCart)
 class UserRecipeAdmin(admin.ModelAdmin):
+    """Связи пользователя с рецептом.
+
+    on_create и on_destroy — те же обработчики (user_id, recipe_ids), что
+    у CreateDestroyM2MMixin, чтобы правки из админки обновляли
+    денормализованные данные.
+    """
     list_display = ['user', 'recipe']
     list_select_related = ['user', 'recipe']
+    on_create = None
+    on_destroy = None
+
+    def created(self, user_id, recipe_ids):
+        if self.on_create is not None:
+            self.on_create(user_id, recipe_ids)
+        transaction.on_commit(lambda: touch_user_state(user_id))
+
+    def destroyed(self, user_id, recipe_ids):
+        if self.on_destroy is not None:
+            self.on_destroy(user_id, recipe_ids)
+        transaction.on_commit(lambda: touch_user_state(user_id))
+
+    def save_model(self, request, obj, form, change):
+        if change:
+            old = type(obj).objects.get(pk=obj.pk)
+            self.destroyed(old.user_id, [old.recipe_id])
+        super().save_model(request, obj, form, change)
+        self.created(obj.user_id, [obj.recipe_id])
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        self.destroyed(obj.user_id, [obj.recipe_id])
+
+    def delete_queryset(self, request, queryset):
+        recipe_ids = defaultdict(list)
+        for user_id, recipe_id in queryset.values_list('user', 'recipe'):
+            recipe_ids[user_id].append(recipe_id)
+        with transaction.atomic():
+            super().delete_queryset(request, queryset)
+            for user_id, ids in recipe_ids.items():
+                self.destroyed(user_id, ids)
+
+
+@admin.register(Favorite)
+class FavoriteAdmin(UserRecipeAdmin):
+    on_create = staticmethod(counters.add_favorites)
+    on_destroy = staticmethod(counters.remove_favorites)
+
+
+@admin.register(ShoppingCart)
+class ShoppingCartAdmin(UserRecipeAdmin):
+    on_create = staticmethod(shopping_list.add_recipes)
+    on_destroy = staticmethod(shopping_list.remove_recipes)
+
+
+@admin.register(ShoppingListItem)
+class ShoppingListItemAdmin(admin.ModelAdmin):
+    list_display = ['user', 'ingredient', 'total_amount']
+    list_select_related = ['user', 'ingredient']
+
+
+@admin.register(ImageJob)
+class ImageJobAdmin(admin.ModelAdmin):
+    list_display = ['recipe', 'status', 'attempts', 'created_at',
+                    'started_at', 'finished_at']
+    list_filter = ['status']
+    list_select_related = ['recipe']
+    readonly_fields = ['recipe', 'attempts', 'error', 'created_at',
+                       'started_at', 'finished_at']
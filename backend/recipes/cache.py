@@ -0,0 +1,74 @@
+import time
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import transaction
+
+from backend.constants import (
+    CATALOG_VERSION_KEY,
+    RECIPES_STATE_KEY,
+    SHOPPING_CART_VERSION_KEY,
+    USER_STATE_KEY
+)
+
+
+def new_version():
+    return uuid4().hex
+
+
+def get_shopping_cart_version(user_id):
+    return cache.get_or_set(
+        SHOPPING_CART_VERSION_KEY.format(user_id=user_id), new_version, None
+    )
+
+
+def bump_shopping_cart_versions(user_ids):
+    cache.set_many({
+        SHOPPING_CART_VERSION_KEY.format(user_id=user_id): new_version()
+        for user_id in user_ids
+    }, None)
+
+
+def bump_shopping_cart_versions_on_commit(user_ids):
+    """Сбрасывает версии корзин после фиксации транзакции.
+
+    Иначе параллельный запрос успеет закэшировать список покупок,
+    собранный до коммита, под уже новой версией.
+    """
+    user_ids = list(user_ids)
+    transaction.on_commit(lambda: bump_shopping_cart_versions(user_ids))
+
+
+def get_user_state(user_id):
+    """Время последнего изменения избранного, корзины или подписок."""
+    return cache.get_or_set(
+        USER_STATE_KEY.format(user_id=user_id), time.time, None
+    )
+
+
+def touch_user_state(user_id):
+    cache.set(USER_STATE_KEY.format(user_id=user_id), time.time(), None)
+
+
+def get_catalog_version(catalog):
+    return cache.get_or_set(
+        CATALOG_VERSION_KEY.format(catalog=catalog), new_version, None
+    )
+
+
+def bump_catalog_version(catalog):
+    cache.set(CATALOG_VERSION_KEY.format(catalog=catalog), new_version(), None)
+
+
+def get_recipes_state():
+    """Время последнего удаления рецепта.
+
+    Создание и изменение рецептов видны по Max(updated_at), а удаление
+    его не меняет; время служит и версией набора, и частью
+    Last-Modified.
+    """
+    return cache.get_or_set(RECIPES_STATE_KEY, time.time, None)
+
+
+def touch_recipes_state():
+    cache.set(RECIPES_STATE_KEY, time.time(), None)
@@ -0,0 +1,58 @@
+"""Денормализованные счётчики Recipe.favorites_count,
+CustomUser.recipes_count и CustomUser.followers_count.
+
+Счётчики меняются F()-выражениями в той же транзакции, что и запись
+избранного или рецепта; reconcile() исправляет накопившийся дрейф.
+"""
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import Favorite, Recipe
+from users.models import CustomUser, Follow
+
+
+def add_favorites(user_id, recipe_ids):
+    Recipe.objects.filter(pk__in=recipe_ids).update(
+        favorites_count=F('favorites_count') + 1
+    )
+
+
+def remove_favorites(user_id, recipe_ids):
+    Recipe.objects.filter(pk__in=recipe_ids).update(
+        favorites_count=F('favorites_count') - 1
+    )
+
+
+def change_recipes_count(author_id, delta):
+    CustomUser.objects.filter(pk=author_id).update(
+        recipes_count=F('recipes_count') + delta
+    )
+
+
+def count_subquery(queryset, field_name):
+    return Coalesce(Subquery(
+        queryset.filter(
+            **{field_name: OuterRef('pk')}
+        ).order_by().values(field_name).annotate(
+            count=Count('pk')
+        ).values('count')
+    ), 0)
+
+
+def reconcile():
+    """Пересчитывает расходящиеся счётчики, возвращает число исправлений."""
+    favorites_count = count_subquery(Favorite.objects.all(), 'recipe')
+    recipes_count = count_subquery(Recipe.objects.all(), 'author')
+    followers_count = count_subquery(Follow.objects.all(), 'author')
+    return (
+        Recipe.objects.exclude(
+            favorites_count=favorites_count
+        ).update(favorites_count=favorites_count),
+        CustomUser.objects.exclude(
+            Q(recipes_count=recipes_count)
+            & Q(followers_count=followers_count)
+        ).update(
+            recipes_count=recipes_count,
+            followers_count=followers_count
+        )
+    )
@@ -0,0 +1,177 @@
+"""Лента рецептов авторов, на которых подписан пользователь.
+
+Новый рецепт сразу раскладывается в FeedEntry всех подписчиков автора
+(fan-out on write), и чтение ленты — проход по индексу одной таблицы
+независимо от числа подписок. Рецепты авторов, у которых больше
+FEED_FANOUT_LIMIT подписчиков, не раскладываются: такие авторы
+дочитываются из Recipe при запросе ленты (fan-out on read).
+
+Когда у автора становится не больше FEED_FANOUT_LIMIT подписчиков, его
+рецепты не раскладываются в рамках запроса: автор помечается
+feed_backfill_pending и дочитывается при чтении, пока команда
+rebuild_feed --pending не дозаполнит ленты.
+"""
+from django.db import connection, transaction
+from django.db.models import F, Q
+
+from backend.constants import FEED_BACKFILL_LIMIT, FEED_FANOUT_LIMIT
+from recipes.models import FeedEntry, Recipe
+from users.models import CustomUser, Follow
+
+LATEST_RECIPES = (
+    'SELECT id, author_id, ROW_NUMBER() OVER ('
+    'PARTITION BY author_id ORDER BY id DESC'
+    ') AS row_number FROM {recipe}{where}'
+)
+
+
+def get_tables():
+    quote_name = connection.ops.quote_name
+    return {
+        name: quote_name(model._meta.db_table)
+        for name, model in (
+            ('feed', FeedEntry),
+            ('recipe', Recipe),
+            ('follow', Follow),
+            ('user', CustomUser),
+        )
+    }
+
+
+def execute(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
+
+def fan_out(recipe):
+    """Добавляет новый рецепт в ленты подписчиков автора."""
+    return execute(
+        'INSERT INTO {feed} (user_id, recipe_id, author_id) '
+        'SELECT follow.follower_id, %s, follow.author_id '
+        'FROM {follow} AS follow '
+        'JOIN {user} AS author ON author.id = follow.author_id '
+        'WHERE follow.author_id = %s AND author.followers_count <= %s '
+        'ON CONFLICT DO NOTHING'.format(**get_tables()),
+        [recipe.pk, recipe.author_id, FEED_FANOUT_LIMIT]
+    )
+
+
+def add_authors(follower_id, author_ids):
+    """Учитывает новые подписки и переносит в ленту свежие рецепты."""
+    CustomUser.objects.filter(pk__in=author_ids).update(
+        followers_count=F('followers_count') + 1
+    )
+    tables = get_tables()
+    execute(
+        'INSERT INTO {feed} (user_id, recipe_id, author_id) '
+        'SELECT %s, latest.id, latest.author_id FROM ({latest}) AS latest '
+        'JOIN {user} AS author ON author.id = latest.author_id '
+        'WHERE latest.row_number <= %s AND author.followers_count <= %s '
+        'ON CONFLICT DO NOTHING'.format(
+            latest=LATEST_RECIPES.format(
+                recipe=tables['recipe'], where=' WHERE author_id = ANY(%s)'
+            ),
+            **tables
+        ),
+        [follower_id, list(author_ids), FEED_BACKFILL_LIMIT,
+         FEED_FANOUT_LIMIT]
+    )
+
+
+def remove_authors(follower_id, author_ids):
+    FeedEntry.objects.filter(
+        user_id=follower_id, author_id__in=author_ids
+    ).delete()
+    decrement_followers(author_ids)
+
+
+def decrement_followers(author_ids):
+    """Уменьшает число подписчиков авторов на одного.
+
+    Автор, у которого подписчиков стало FEED_FANOUT_LIMIT, перестаёт
+    дочитываться при чтении ленты, а часть его рецептов разложена не
+    всем подписчикам. Такого автора функция только помечает, ленты
+    дозаполняет backfill_pending вне запроса.
+    """
+    if not author_ids:
+        return
+    execute(
+        'UPDATE {user} SET followers_count = followers_count - 1, '
+        'feed_backfill_pending = feed_backfill_pending '
+        'OR followers_count - 1 = %s '
+        'WHERE id = ANY(%s)'.format(**get_tables()),
+        [FEED_FANOUT_LIMIT, list(author_ids)]
+    )
+
+
+def get_recipe_ids(user_id, before=None, limit=None):
+    """id рецептов ленты по убыванию, меньше before, не больше limit."""
+    entries = FeedEntry.objects.filter(user_id=user_id)
+    pulled = Recipe.objects.filter(author__in=Follow.objects.filter(
+        Q(author__followers_count__gt=FEED_FANOUT_LIMIT)
+        | Q(author__feed_backfill_pending=True),
+        follower_id=user_id
+    ).values('author'))
+    if before is not None:
+        entries = entries.filter(recipe_id__lt=before)
+        pulled = pulled.filter(pk__lt=before)
+    return list(
+        entries.order_by('-recipe_id').values_list(
+            'recipe_id', flat=True
+        )[:limit].union(
+            pulled.order_by('-pk').values_list('pk', flat=True)[:limit]
+        ).order_by('-recipe_id')[:limit]
+    )
+
+
+def backfill(author_ids=None):
+    """Раскладывает последние рецепты авторов в ленты их подписчиков.
+
+    Без author_ids — по всем авторам; возвращает число новых записей.
+    """
+    tables = get_tables()
+    where, params = '', []
+    if author_ids is not None:
+        where, params = ' WHERE author_id = ANY(%s)', [list(author_ids)]
+    return execute(
+        'INSERT INTO {feed} (user_id, recipe_id, author_id) '
+        'SELECT follow.follower_id, latest.id, latest.author_id '
+        'FROM {follow} AS follow '
+        'JOIN {user} AS author ON author.id = follow.author_id '
+        'JOIN ({latest}) AS latest ON latest.author_id = follow.author_id '
+        'WHERE latest.row_number <= %s AND author.followers_count <= %s '
+        'ON CONFLICT DO NOTHING'.format(
+            latest=LATEST_RECIPES.format(recipe=tables['recipe'], where=where),
+            **tables
+        ),
+        params + [FEED_BACKFILL_LIMIT, FEED_FANOUT_LIMIT]
+    )
+
+
+def backfill_pending():
+    """Дозаполняет ленты подписчиков помеченных авторов.
+
+    Пометка снимается в той же транзакции, поэтому до коммита такие
+    авторы продолжают дочитываться при чтении. Возвращает число авторов и
+    новых записей.
+    """
+    with transaction.atomic():
+        author_ids = list(CustomUser.objects.filter(
+            feed_backfill_pending=True
+        ).select_for_update(skip_locked=True).values_list('pk', flat=True))
+        if not author_ids:
+            return 0, 0
+        CustomUser.objects.filter(pk__in=author_ids).update(
+            feed_backfill_pending=False
+        )
+        return len(author_ids), backfill(author_ids)
+
+
+def rebuild():
+    """Пересобирает все ленты из подписок; возвращает число записей."""
+    FeedEntry.objects.all().delete()
+    CustomUser.objects.filter(feed_backfill_pending=True).update(
+        feed_backfill_pending=False
+    )
+    return backfill()
@@ -0,0 +1,116 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+
+from backend.constants import IMAGE_JOB_MAX_ATTEMPTS, IMAGE_JOB_TIMEOUT
+from backend.stats import summarize
+from recipes.images import save_variants
+from recipes.models import ImageJob, ImageStatus, Recipe
+
+STATS_SAMPLE_SIZE = 1000
+
+
+def enqueue(recipe):
+    """Ставит обработку изображения рецепта в очередь.
+
+    Рецепт должен быть уже сохранён с image_status PROCESSING.
+    """
+    return ImageJob.objects.create(recipe=recipe)
+
+
+def claim_jobs(limit):
+    """Забирает до limit задач, пропуская заблокированные другими воркерами.
+
+    Задачи, зависшие в обработке дольше IMAGE_JOB_TIMEOUT (например, после
+    падения воркера), забираются повторно.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        job_ids = list(
+            ImageJob.objects.select_for_update(skip_locked=True).filter(
+                Q(status=ImageJob.Status.PENDING)
+                | Q(
+                    status=ImageJob.Status.PROCESSING,
+                    started_at__lt=now - timedelta(seconds=IMAGE_JOB_TIMEOUT)
+                )
+            ).order_by('id').values_list('id', flat=True)[:limit]
+        )
+        ImageJob.objects.filter(id__in=job_ids).update(
+            status=ImageJob.Status.PROCESSING,
+            started_at=now,
+            attempts=F('attempts') + 1
+        )
+    return list(
+        ImageJob.objects.filter(id__in=job_ids).select_related('recipe')
+    )
+
+
+def complete_job(job, processed):
+    save_variants(job.recipe, processed)
+    ImageJob.objects.filter(pk=job.pk).update(
+        status=ImageJob.Status.DONE,
+        finished_at=timezone.now(),
+        error=''
+    )
+
+
+def fail_job(job, error):
+    """Возвращает задачу в очередь или, после последней попытки, помечает
+    её и изображение рецепта как ошибочные."""
+    if job.attempts < IMAGE_JOB_MAX_ATTEMPTS:
+        ImageJob.objects.filter(pk=job.pk).update(
+            status=ImageJob.Status.PENDING,
+            error=str(error)
+        )
+        return
+    now = timezone.now()
+    with transaction.atomic():
+        ImageJob.objects.filter(pk=job.pk).update(
+            status=ImageJob.Status.FAILED,
+            finished_at=now,
+            error=str(error)
+        )
+        # updated_at меняет ETag рецепта, иначе клиенты с кэшем так и
+        # видели бы image_status=processing.
+        Recipe.objects.filter(
+            pk=job.recipe_id, image=job.recipe.image.name
+        ).update(image_status=ImageStatus.FAILED, updated_at=now)
+
+
+def get_queue_stats():
+    """Глубина очереди по статусам и задержки последних выполненных задач.
+
+    Задержка — время от постановки в очередь до завершения, обработка —
+    от взятия воркером до завершения; в секундах.
+    """
+    depth = dict(
+        ImageJob.objects.order_by().values_list('status').annotate(
+            count=Count('id')
+        )
+    )
+    oldest_pending = ImageJob.objects.filter(
+        status=ImageJob.Status.PENDING
+    ).aggregate(created_at=Min('created_at'))['created_at']
+    recent = ImageJob.objects.filter(
+        status=ImageJob.Status.DONE
+    ).order_by('-finished_at').values_list(
+        'created_at', 'started_at', 'finished_at'
+    )[:STATS_SAMPLE_SIZE]
+    latencies = []
+    durations = []
+    for created_at, started_at, finished_at in recent:
+        latencies.append((finished_at - created_at).total_seconds())
+        durations.append((finished_at - started_at).total_seconds())
+    return {
+        'depth': {
+            status: depth.get(status, 0) for status in ImageJob.Status.values
+        },
+        'oldest_pending_age': (
+            (timezone.now() - oldest_pending).total_seconds()
+            if oldest_pending else None
+        ),
+        'latency': summarize(latencies),
+        'processing': summarize(durations),
+    }
@@ -0,0 +1,102 @@
+import io
+from pathlib import PurePath
+
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from backend.constants import (
+    IMAGE_MAX_SIZE,
+    JPEG_QUALITY,
+    THUMBNAIL_SIZE,
+    WEBP_QUALITY
+)
+from recipes.models import ImageStatus, Recipe
+
+IMAGE_FORMATS = {'JPEG': '.jpg', 'PNG': '.png', 'WEBP': '.webp'}
+ENCODE_OPTIONS = {
+    'JPEG': {'quality': JPEG_QUALITY, 'optimize': True},
+    'PNG': {'optimize': True},
+    'WEBP': {'quality': WEBP_QUALITY},
+}
+
+
+def encode(image, image_format):
+    if image_format == 'JPEG':
+        image = image.convert('RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, image_format, **ENCODE_OPTIONS[image_format])
+    return buffer.getvalue()
+
+
+def process_image(path, reencode_original=True):
+    """Пережимает оригинал и строит миниатюру и WebP-варианты.
+
+    Оригинал уменьшается до IMAGE_MAX_SIZE и сохраняется заново без
+    метаданных; с reencode_original=False он не возвращается и остаётся
+    как есть. Функция работает только с файлом, поэтому её можно
+    выполнять в отдельном процессе. Возвращает пары (суффикс имени, байты)
+    по именам полей рецепта.
+    """
+    with Image.open(path) as original:
+        image_format = (
+            original.format if original.format in IMAGE_FORMATS else 'PNG'
+        )
+        image = ImageOps.exif_transpose(original)
+        image = image.convert(
+            'RGBA' if 'A' in image.getbands() else 'RGB'
+        )
+    image.thumbnail(IMAGE_MAX_SIZE, Image.LANCZOS)
+    thumbnail = image.copy()
+    thumbnail.thumbnail(THUMBNAIL_SIZE, Image.LANCZOS)
+    processed = {
+        'image_webp': ('.webp', encode(image, 'WEBP')),
+        'thumbnail': ('_thumb.jpg', encode(thumbnail, 'JPEG')),
+        'thumbnail_webp': ('_thumb.webp', encode(thumbnail, 'WEBP')),
+    }
+    if reencode_original:
+        processed['image'] = (
+            IMAGE_FORMATS[image_format], encode(image, image_format)
+        )
+    return processed
+
+
+def save_variants(recipe, processed):
+    """Сохраняет результат process_image в файлы и поля рецепта.
+
+    Поля обновляются, только если изображение рецепта не сменилось за время
+    обработки; иначе новые файлы удаляются и возвращается False.
+    """
+    source_name = recipe.image.name
+    stem = PurePath(source_name).stem
+    old_names = []
+    for field_name, (suffix, content) in processed.items():
+        file = getattr(recipe, field_name)
+        if file:
+            old_names.append(file.name)
+        file.save(f'{stem}{suffix}', ContentFile(content), save=False)
+    new_names = {
+        field_name: getattr(recipe, field_name).name
+        for field_name in processed
+    }
+    updated = Recipe.objects.filter(
+        pk=recipe.pk, image=source_name
+    ).update(
+        image_status=ImageStatus.READY,
+        updated_at=timezone.now(),
+        **new_names
+    )
+    if updated:
+        stale_names = set(old_names) - set(new_names.values())
+    else:
+        stale_names = set(new_names.values())
+    for name in stale_names:
+        recipe.image.storage.delete(name)
+    return bool(updated)
+
+
+def generate_variants(recipe):
+    """Строит недостающие варианты, не трогая файл оригинала."""
+    return save_variants(recipe, process_image(
+        recipe.image.path, reencode_original=False
+    ))
@@ -0,0 +1,70 @@
+import threading
+import time
+from bisect import bisect_left
+from sys import maxunicode
+
+from backend.constants import INGREDIENT_INDEX_TTL
+from recipes.cache import get_catalog_version
+from recipes.models import Ingredient
+
+
+class IngredientPrefixIndex:
+    """Отсортированный индекс названий ингредиентов в памяти процесса.
+
+    Строится при первом обращении, ищет по префиксу бинарным поиском
+    без учёта регистра. Перестраивается при смене версии каталога
+    ингредиентов в кэше; TTL ограничивает устаревание, если кэш не общий
+    для процессов.
+    """
+
+    def __init__(self, ttl=INGREDIENT_INDEX_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # (версия, время построения, ключи, элементы) заменяется целиком,
+        # чтобы поиск без блокировки не смешал ключи и элементы разных
+        # построений.
+        self._snapshot = None
+
+    def _is_fresh(self, snapshot, version):
+        return (snapshot is not None and snapshot[0] == version
+                and time.monotonic() - snapshot[1] < self.ttl)
+
+    def _build(self, version):
+        with self._lock:
+            snapshot = self._snapshot
+            if self._is_fresh(snapshot, version):
+                return snapshot
+        rows = sorted(
+            (name.casefold(), name, pk, measurement_unit)
+            for pk, name, measurement_unit in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit'
+            )
+        )
+        snapshot = (
+            version,
+            time.monotonic(),
+            tuple(row[0] for row in rows),
+            tuple(
+                {'id': pk, 'name': name, 'measurement_unit': unit}
+                for _, name, pk, unit in rows
+            )
+        )
+        with self._lock:
+            self._snapshot = snapshot
+        return snapshot
+
+    def search(self, prefix='', limit=None):
+        version = get_catalog_version(Ingredient._meta.model_name)
+        snapshot = self._snapshot
+        if not self._is_fresh(snapshot, version):
+            snapshot = self._build(version)
+        _, _, keys, items = snapshot
+        prefix = prefix.casefold()
+        start = bisect_left(keys, prefix)
+        stop = bisect_left(keys, prefix + chr(maxunicode), lo=start)
+        if limit is not None:
+            stop = min(stop, start + limit)
+        return list(items[start:stop])
+
+
+ingredient_index = IngredientPrefixIndex()
@@ -0,0 +1,216 @@
+import random
+import time
+from itertools import accumulate, islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.counters import reconcile
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    IngredientToRecipe,
+    Recipe,
+    ShoppingCart,
+    Tag
+)
+from users.models import CustomUser, Follow
+
+DEFAULT_TAGS = (
+    ('Завтрак', '#E26C2D', 'breakfast'),
+    ('Обед', '#49B64E', 'lunch'),
+    ('Ужин', '#8775D2', 'dinner'),
+)
+WORDS = ('суп', 'салат', 'пирог', 'каша', 'рагу', 'запеканка', 'паста',
+         'омлет', 'котлеты', 'блины', 'плов', 'борщ', 'десерт', 'соус')
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def popularity(rng, count):
+    """Накопленные веса с тяжёлым хвостом: немногие объекты популярны."""
+    return list(accumulate(rng.paretovariate(1.2) for _ in range(count)))
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу синтетическими пользователями, подписками, '
+            'рецептами, избранным и корзинами для нагрузочных замеров')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--follows', type=int, default=200000)
+        parser.add_argument('--recipes', type=int, default=100000)
+        parser.add_argument('--favorites', type=int, default=1000000)
+        parser.add_argument('--carts', type=int, default=100000)
+        parser.add_argument(
+            '--ingredients-per-recipe', type=int, nargs=2, default=(3, 12),
+            metavar=('MIN', 'MAX')
+        )
+        parser.add_argument(
+            '--tags-per-recipe', type=int, nargs=2, default=(1, 3),
+            metavar=('MIN', 'MAX')
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--prefix', default='synthetic',
+            help='Префикс email и имён синтетических пользователей'
+        )
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        prefix = options['prefix']
+        if CustomUser.objects.filter(
+                email__startswith=f'{prefix}-').exists():
+            raise CommandError(
+                f'Данные с префиксом {prefix} уже есть, выберите другой '
+                'префикс или удалите их'
+            )
+        ingredient_ids = list(Ingredient.objects.values_list('pk', flat=True))
+        if not ingredient_ids:
+            raise CommandError('Сначала загрузите ингредиенты')
+        start = time.perf_counter()
+        with transaction.atomic():
+            tag_ids = self.get_tag_ids()
+            user_ids = self.create_users(prefix, options['users'])
+            self.report('пользователей', len(user_ids), start)
+            self.report('подписок', self.create_follows(
+                user_ids, options['follows']
+            ), start)
+            recipe_ids = self.create_recipes(user_ids, options['recipes'])
+            self.report('рецептов', len(recipe_ids), start)
+            self.report('ингредиентов рецептов', self.create_recipe_links(
+                recipe_ids, ingredient_ids,
+                options['ingredients_per_recipe'], self.ingredient_link
+            ), start)
+            self.report('тегов рецептов', self.create_recipe_links(
+                recipe_ids, tag_ids,
+                options['tags_per_recipe'], self.tag_link
+            ), start)
+            self.report('избранного', self.create_user_recipes(
+                Favorite, user_ids, recipe_ids, options['favorites']
+            ), start)
+            self.report('рецептов в корзинах', self.create_user_recipes(
+                ShoppingCart, user_ids, recipe_ids, options['carts']
+            ), start)
+            reconcile()
+            call_command('rebuild_shopping_lists', stdout=self.stdout)
+            call_command('rebuild_feed', stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {time.perf_counter() - start:.1f} с'
+        ))
+
+    def report(self, name, count, start):
+        self.stdout.write(
+            f'Создано {name}: {count} '
+            f'({time.perf_counter() - start:.1f} с с начала)'
+        )
+
+    def bulk_create(self, model, objects):
+        # ignore_conflicts отбрасывает повторные пары, поэтому созданные
+        # строки считаются по таблице, а не по отправленным объектам.
+        count_before = model.objects.count()
+        for batch in batched(objects, self.batch_size):
+            model.objects.bulk_create(batch, ignore_conflicts=True)
+        return model.objects.count() - count_before
+
+    def get_tag_ids(self):
+        if not Tag.objects.exists():
+            Tag.objects.bulk_create(
+                Tag(name=name, color=color, slug=slug)
+                for name, color, slug in DEFAULT_TAGS
+            )
+        return list(Tag.objects.values_list('pk', flat=True))
+
+    def create_users(self, prefix, count):
+        password = make_password(None)
+        user_ids = []
+        for batch in batched(range(count), self.batch_size):
+            user_ids.extend(user.pk for user in CustomUser.objects.bulk_create(
+                CustomUser(
+                    email=f'{prefix}-{number}@example.com',
+                    username=f'{prefix}-{number}',
+                    first_name=f'Имя{number}',
+                    last_name=f'Фамилия{self.rng.randrange(count)}',
+                    password=password
+                )
+                for number in batch
+            ))
+        return user_ids
+
+    def create_follows(self, user_ids, count):
+        weights = popularity(self.rng, len(user_ids))
+        return self.bulk_create(Follow, (
+            Follow(follower_id=follower_id, author_id=author_id)
+            for follower_id, author_id in (
+                (
+                    self.rng.choice(user_ids),
+                    self.rng.choices(user_ids, cum_weights=weights)[0]
+                )
+                for _ in range(count)
+            )
+            if follower_id != author_id
+        ))
+
+    def create_recipes(self, user_ids, count):
+        weights = popularity(self.rng, len(user_ids))
+        recipe_ids = []
+        for batch in batched(range(count), self.batch_size):
+            recipes = Recipe.objects.bulk_create(
+                Recipe(
+                    author_id=self.rng.choices(
+                        user_ids, cum_weights=weights
+                    )[0],
+                    name=f'{self.rng.choice(WORDS).capitalize()} {number}',
+                    text=' '.join(self.rng.choices(WORDS, k=30)),
+                    cooking_time=self.rng.randint(5, 180),
+                    image='synthetic.png'
+                )
+                for number in batch
+            )
+            recipe_ids.extend(recipe.pk for recipe in recipes)
+        return recipe_ids
+
+    def ingredient_link(self, recipe_id, ingredient_id):
+        return IngredientToRecipe(
+            recipe_id=recipe_id,
+            ingredient_id=ingredient_id,
+            amount=self.rng.randint(1, 500)
+        )
+
+    @staticmethod
+    def tag_link(recipe_id, tag_id):
+        return Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+
+    def create_recipe_links(self, recipe_ids, object_ids, bounds, make_link):
+        low, high = bounds
+        model = make_link(recipe_ids[0], object_ids[0]).__class__
+        return self.bulk_create(model, (
+            make_link(recipe_id, object_id)
+            for recipe_id in recipe_ids
+            for object_id in self.rng.sample(
+                object_ids, min(len(object_ids), self.rng.randint(low, high))
+            )
+        ))
+
+    def create_user_recipes(self, model, user_ids, recipe_ids, count):
+        user_weights = popularity(self.rng, len(user_ids))
+        recipe_weights = popularity(self.rng, len(recipe_ids))
+        return self.bulk_create(model, (
+            model(
+                user_id=self.rng.choices(
+                    user_ids, cum_weights=user_weights
+                )[0],
+                recipe_id=self.rng.choices(
+                    recipe_ids, cum_weights=recipe_weights
+                )[0]
+            )
+            for _ in range(count)
+        ))
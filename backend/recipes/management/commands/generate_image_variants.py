@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from PIL import UnidentifiedImageError
+
+from recipes.images import generate_variants
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = ('Создаёт миниатюры и WebP-варианты изображений рецептов, '
+            'у которых их ещё нет')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Пересоздать варианты для всех рецептов'
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='')
+        if not options['force']:
+            recipes = recipes.filter(thumbnail='')
+        generated = failed = 0
+        for recipe in recipes.iterator():
+            try:
+                generate_variants(recipe)
+            except (OSError, UnidentifiedImageError) as error:
+                failed += 1
+                self.stderr.write(f'Рецепт {recipe.pk}: {error}')
+                continue
+            generated += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано вариантов: {generated}, ошибок: {failed}'
+        ))
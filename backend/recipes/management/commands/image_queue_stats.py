@@ -0,0 +1,13 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from recipes.image_queue import get_queue_stats
+
+
+class Command(BaseCommand):
+    help = ('Выводит глубину очереди обработки изображений и задержки '
+            'выполненных задач в JSON')
+
+    def handle(self, *args, **options):
+        self.stdout.write(json.dumps(get_queue_stats(), indent=2))
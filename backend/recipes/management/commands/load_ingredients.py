@@ -0,0 +1,86 @@
+import csv
+import json
+import time
+from itertools import islice
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.cache import bump_catalog_version
+from recipes.models import Ingredient
+
+DEFAULT_PATH = settings.BASE_DIR.parent / 'data' / 'ingredients.csv'
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def read_csv(file):
+    for row in csv.reader(file):
+        if row:
+            name, measurement_unit = row
+            yield name, measurement_unit
+
+
+def read_json(file):
+    """Потоково разбирает JSON-массив объектов, не читая файл целиком."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    for chunk in iter(lambda: file.read(READ_CHUNK_SIZE), ''):
+        buffer = buffer[position:] + chunk
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in '[], \r\n\t':
+                position += 1
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                break
+            yield item['name'], item['measurement_unit']
+    if buffer[position:].strip(' ]\r\n\t'):
+        raise CommandError('Некорректный JSON в конце файла')
+
+
+READERS = {
+    '.csv': read_csv,
+    '.json': read_json,
+}
+
+
+class Command(BaseCommand):
+    help = ('Загружает ингредиенты из data/ingredients.csv или '
+            'ingredients.json пакетами, пропуская уже существующие')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', type=Path, default=DEFAULT_PATH)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        reader = READERS.get(path.suffix.lower())
+        if reader is None:
+            raise CommandError(f'Неподдерживаемый формат файла: {path}')
+        start = time.perf_counter()
+        total = 0
+        with open(path, encoding='utf-8') as file, transaction.atomic():
+            count_before = Ingredient.objects.count()
+            rows = reader(file)
+            while True:
+                batch = [
+                    Ingredient(name=name, measurement_unit=measurement_unit)
+                    for name, measurement_unit in islice(
+                        rows, options['batch_size']
+                    )
+                ]
+                if not batch:
+                    break
+                Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+                total += len(batch)
+            created = Ingredient.objects.count() - count_before
+        bump_catalog_version(Ingredient._meta.model_name)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Прочитано {total}, добавлено {created} ингредиентов '
+            f'за {elapsed:.3f} с ({total / elapsed:.0f} строк/с)'
+        ))
@@ -0,0 +1,101 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.core.management.base import BaseCommand
+
+from backend.constants import IMAGE_JOB_BATCH_SIZE, IMAGE_JOB_POLL_INTERVAL
+from recipes.image_queue import claim_jobs, complete_job, fail_job
+from recipes.images import process_image
+
+
+class Command(BaseCommand):
+    help = ('Обрабатывает очередь изображений рецептов: уменьшает, '
+            'пережимает без метаданных и строит варианты')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count(),
+            help='Число процессов обработки'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=IMAGE_JOB_BATCH_SIZE,
+            help='Сколько задач забирать из очереди за раз'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=IMAGE_JOB_POLL_INTERVAL,
+            help='Пауза между опросами пустой очереди, с'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Разобрать очередь и завершиться'
+        )
+
+    def handle(self, *args, **options):
+        self.workers = options['workers']
+        pool = self.create_pool()
+        try:
+            while True:
+                jobs = claim_jobs(options['batch_size'])
+                if not jobs:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+                if not self.process(pool, jobs):
+                    self.stderr.write('Пул процессов сломан, пересоздаю')
+                    pool.shutdown(wait=False)
+                    pool = self.create_pool()
+        finally:
+            pool.shutdown()
+
+    def create_pool(self):
+        # Пул создаёт процессы лениво, уже после первого claim_jobs, и при
+        # fork они унаследовали бы открытые соединения с базой. Процессы
+        # spawn стартуют с чистым состоянием и только настраивают Django.
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=django.setup
+        )
+
+    def process(self, pool, jobs):
+        """Обрабатывает задачи; возвращает False, если пул сломан.
+
+        Ошибка любой задачи, в том числе при отправке в пул, отмечается
+        через fail_job, и цикл обработки продолжается.
+        """
+        futures = {}
+        broken = False
+        for job in jobs:
+            try:
+                futures[pool.submit(
+                    process_image, job.recipe.image.path
+                )] = job
+            except Exception as error:
+                broken |= isinstance(error, BrokenProcessPool)
+                self.fail(job, error)
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                complete_job(job, future.result())
+            except Exception as error:
+                broken |= isinstance(error, BrokenProcessPool)
+                self.fail(job, error)
+                continue
+            self.stdout.write(f'Задача {job.pk}: рецепт {job.recipe_id}')
+        return not broken
+
+    def fail(self, job, error):
+        fail_job(job, error)
+        self.stderr.write(f'Задача {job.pk}: {error!r}')
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes import feed
+
+
+class Command(BaseCommand):
+    help = ('Пересобирает ленты подписок из таблицы подписок: последние '
+            'рецепты каждого автора, кроме авторов с большим числом '
+            'подписчиков')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pending',
+            action='store_true',
+            help='Только дозаполнить ленты подписчиков помеченных авторов'
+        )
+
+    def handle(self, *args, **options):
+        if options['pending']:
+            authors, entries = feed.backfill_pending()
+            self.stdout.write(self.style.SUCCESS(
+                f'Дозаполнены ленты {authors} авторов, записей: {entries}'
+            ))
+            return
+        with transaction.atomic():
+            entries = feed.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Записей в лентах: {entries}'
+        ))
@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.cache import bump_shopping_cart_versions_on_commit
+from recipes.models import ShoppingListItem
+from recipes.shopping_list import get_expected_items
+
+
+class Command(BaseCommand):
+    help = ('Сверяет агрегат списков покупок с корзинами и пересобирает '
+            'списки пользователей, у которых найдены расхождения')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Только проверить, завершиться с ошибкой при расхождениях'
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            expected = get_expected_items()
+            actual = {
+                (user_id, ingredient_id): total_amount
+                for user_id, ingredient_id, total_amount in
+                ShoppingListItem.objects.values_list(
+                    'user_id', 'ingredient_id', 'total_amount'
+                ).iterator()
+            }
+            user_ids = {
+                user_id for user_id, ingredient_id in expected.keys()
+                | actual.keys()
+                if expected.get((user_id, ingredient_id))
+                != actual.get((user_id, ingredient_id))
+            }
+            self.stdout.write(
+                f'Позиций: ожидается {len(expected)}, в таблице '
+                f'{len(actual)}; пользователей с расхождениями: '
+                f'{len(user_ids)}'
+            )
+            if options['verify']:
+                if user_ids:
+                    raise CommandError('Агрегат списков покупок расходится '
+                                       'с корзинами')
+                return
+            ShoppingListItem.objects.filter(user_id__in=user_ids).delete()
+            ShoppingListItem.objects.bulk_create(
+                (
+                    ShoppingListItem(
+                        user_id=user_id,
+                        ingredient_id=ingredient_id,
+                        total_amount=total_amount
+                    )
+                    for (user_id, ingredient_id), total_amount
+                    in expected.items() if user_id in user_ids
+                ),
+                batch_size=1000
+            )
+            bump_shopping_cart_versions_on_commit(user_ids)
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересобраны списки {len(user_ids)} пользователей'
+        ))
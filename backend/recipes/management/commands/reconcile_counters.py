@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.counters import reconcile
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счётчики избранного у рецептов и рецептов '
+            'у авторов, исправляя расхождения')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            recipes_fixed, users_fixed = reconcile()
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено рецептов: {recipes_fixed}, '
+            f'пользователей: {users_fixed}'
+        ))
@@ -0,0 +1,66 @@
+# Generated by Django 3.2.3 on 2026-10-18 18:21
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+from backend.constants import FEED_BACKFILL_LIMIT, FEED_FANOUT_LIMIT
+
+
+def fill_feed_entries(apps, schema_editor):
+    tables = {
+        name: apps.get_model(app, model)._meta.db_table
+        for name, (app, model) in {
+            'feed': ('recipes', 'FeedEntry'),
+            'recipe': ('recipes', 'Recipe'),
+            'follow': ('users', 'Follow'),
+            'user': ('users', 'CustomUser'),
+        }.items()
+    }
+    schema_editor.execute(
+        'INSERT INTO {feed} (user_id, recipe_id, author_id) '
+        'SELECT follow.follower_id, latest.id, latest.author_id '
+        'FROM {follow} AS follow '
+        'JOIN {user} AS author ON author.id = follow.author_id '
+        'JOIN (SELECT id, author_id, ROW_NUMBER() OVER ('
+        'PARTITION BY author_id ORDER BY id DESC) AS row_number '
+        'FROM {recipe}) AS latest ON latest.author_id = follow.author_id '
+        'WHERE latest.row_number <= %s AND author.followers_count <= %s'
+        .format(**tables),
+        (FEED_BACKFILL_LIMIT, FEED_FANOUT_LIMIT)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0011_recipe_indexes'),
+        ('users', '0005_customuser_followers_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор рецепта')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='recipes.recipe', verbose_name='Рецепт')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to=settings.AUTH_USER_MODEL, verbose_name='Подписчик')),
+            ],
+            options={
+                'verbose_name': 'Запись ленты',
+                'verbose_name_plural': 'Записи лент',
+                'ordering': ('-recipe',),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='feedentry',
+            index=models.Index(fields=['user', 'author'], name='feed_entry_user_author_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='feedentry',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='feed_entry_user_recipe_unique_constraint'),
+        ),
+        migrations.RunPython(fill_feed_entries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 3.2.3 on 2026-10-18 21:55
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """Триграммный индекс по UPPER(name) для icontains в поиске
+    ингредиентов.
+
+    icontains компилируется в UPPER(name::text) LIKE UPPER(%s), что
+    индекс ingredient_name_trgm_idx по name обслужить не может. Django 3.2
+    не задаёт класс операторов для индекса по выражению, поэтому индекс
+    создаётся SQL-запросом.
+    """
+
+    dependencies = [
+        ('recipes', '0012_feedentry'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX ingredient_name_upper_trgm_idx '
+            'ON recipes_ingredient USING gin '
+            '((UPPER(name::text)) gin_trgm_ops)',
+            'DROP INDEX ingredient_name_upper_trgm_idx',
+        ),
+    ]
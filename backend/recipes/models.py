@@ -1,5 +1,6 @@
+from django.contrib.postgres.indexes import GinIndex
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.db import models
+from django.db import connection, models
 
 from backend.constants import (
     MAX_FIELD_LENGTH,
@@ -7,7 +8,13 @@ from backend.constants import (
     MAX_FIELD_VALUE,
     MAX_STR_LENGTH
 )
-from users.models import CustomUser
+from users.models import CounterFieldsMixin, CustomUser
+
+
+class ImageStatus(models.TextChoices):
+    PROCESSING = 'processing', 'Обрабатывается'
+    READY = 'ready', 'Готово'
+    FAILED = 'failed', 'Ошибка обработки'
 
 
 class Tag(models.Model):
@@ -50,9 +57,55 @@ class Ingredient(models.Model):
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
         ordering = ('name',)
+        indexes = [
+            GinIndex(
+                fields=('name',),
+                name='ingredient_name_trgm_idx',
+                opclasses=('gin_trgm_ops',)
+            )
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=('name', 'measurement_unit'),
+                name='ingredient_name_measurement_unit_unique_constraint'
+            )
+        ]
+
 
+class RecipeManager(models.Manager):
+    # Поля краткого рецепта в подписках; text и остальное не читаются.
+    preview_fields = (
+        'id', 'author', 'name', 'image', 'image_webp', 'thumbnail',
+        'thumbnail_webp', 'image_status', 'cooking_time'
+    )
+
+    def previews_for_authors(self, author_ids, limit=None):
+        """Первые limit рецептов каждого автора одним оконным запросом."""
+        if not author_ids:
+            return []
+        params = list(author_ids)
+        quote_name = connection.ops.quote_name
+        query = (
+            'SELECT * FROM ('
+            'SELECT {columns}, ROW_NUMBER() OVER ('
+            'PARTITION BY author_id ORDER BY name, id'
+            ') AS row_number FROM {table} WHERE author_id IN ({ids})'
+            ') AS previews'
+        ).format(
+            columns=', '.join(
+                quote_name(self.model._meta.get_field(name).column)
+                for name in self.preview_fields
+            ),
+            table=quote_name(self.model._meta.db_table),
+            ids=', '.join(['%s'] * len(params))
+        )
+        if limit is not None:
+            query += ' WHERE row_number <= %s'
+            params.append(limit)
+        return self.raw(query + ' ORDER BY author_id, row_number', params)
 
-class Recipe(models.Model):
+
+class Recipe(CounterFieldsMixin, models.Model):
     name = models.CharField(
         max_length=MAX_FIELD_LENGTH,
         verbose_name='Название'
@@ -84,11 +137,56 @@ class Recipe(models.Model):
         related_name='recipes'
     )
     image = models.ImageField(verbose_name='Изображение рецепта')
+    thumbnail = models.ImageField(
+        verbose_name='Миниатюра',
+        upload_to='variants/',
+        blank=True,
+        editable=False
+    )
+    thumbnail_webp = models.ImageField(
+        verbose_name='Миниатюра WebP',
+        upload_to='variants/',
+        blank=True,
+        editable=False
+    )
+    image_webp = models.ImageField(
+        verbose_name='Изображение WebP',
+        upload_to='variants/',
+        blank=True,
+        editable=False
+    )
+    image_status = models.CharField(
+        verbose_name='Состояние изображения',
+        max_length=20,
+        choices=ImageStatus.choices,
+        default=ImageStatus.READY,
+        editable=False
+    )
+    favorites_count = models.IntegerField(
+        verbose_name='В избранном',
+        default=0,
+        editable=False
+    )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True,
+        db_index=True
+    )
+
+    objects = RecipeManager()
+    counter_fields = ('favorites_count',)
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('name',)
+        indexes = [
+            models.Index(fields=('name',), name='recipe_name_idx'),
+            models.Index(
+                fields=('author', 'name', 'id'),
+                name='recipe_author_name_idx'
+            )
+        ]
 
     def __str__(self):
         return self.name[:MAX_STR_LENGTH]
@@ -177,3 +275,132 @@ class ShoppingCart(AbsractUserRecipe):
                 name='shopping_cart_user_recipe_unique_constraint'
             )
         ]
+
+
+class ShoppingListItem(models.Model):
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name='Ингредиент'
+    )
+    total_amount = models.IntegerField(verbose_name='Количество')
+
+    class Meta:
+        default_related_name = 'shopping_list_items'
+        verbose_name = 'Позиция списка покупок'
+        verbose_name_plural = 'Позиции списков покупок'
+        ordering = ('ingredient__name',)
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='shopping_list_item_user_ingredient_unique_constraint'
+            )
+        ]
+
+    def __str__(self):
+        return (f'{self.user.last_name[:MAX_STR_LENGTH]} - '
+                f'{self.ingredient.name[:MAX_STR_LENGTH]}')
+
+
+class FeedEntry(models.Model):
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Подписчик'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Рецепт'
+    )
+    author = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор рецепта'
+    )
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи лент'
+        ordering = ('-recipe',)
+        indexes = [
+            models.Index(
+                fields=('user', 'author'),
+                name='feed_entry_user_author_idx'
+            )
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='feed_entry_user_recipe_unique_constraint'
+            )
+        ]
+
+    def __str__(self):
+        return (f'{self.user.last_name[:MAX_STR_LENGTH]} - '
+                f'{self.recipe.name[:MAX_STR_LENGTH]}')
+
+
+class ImageJob(models.Model):
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'В очереди'
+        PROCESSING = 'processing', 'Обрабатывается'
+        DONE = 'done', 'Выполнена'
+        FAILED = 'failed', 'Ошибка'
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='image_jobs',
+        verbose_name='Рецепт'
+    )
+    status = models.CharField(
+        verbose_name='Статус',
+        max_length=20,
+        choices=Status.choices,
+        default=Status.PENDING
+    )
+    attempts = models.PositiveSmallIntegerField(
+        verbose_name='Попыток',
+        default=0
+    )
+    error = models.TextField(
+        verbose_name='Ошибка',
+        blank=True
+    )
+    created_at = models.DateTimeField(
+        verbose_name='Поставлена в очередь',
+        auto_now_add=True
+    )
+    started_at = models.DateTimeField(
+        verbose_name='Начата',
+        null=True,
+        blank=True
+    )
+    finished_at = models.DateTimeField(
+        verbose_name='Завершена',
+        null=True,
+        blank=True
+    )
+
+    class Meta:
+        verbose_name = 'Задача обработки изображения'
+        verbose_name_plural = 'Задачи обработки изображений'
+        ordering = ('id',)
+        indexes = [
+            models.Index(
+                fields=('status', 'id'),
+                name='image_job_status_idx'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.recipe_id}: {self.get_status_display()}'
@@ -0,0 +1,115 @@
+"""Инкрементальное обслуживание агрегата ShoppingListItem.
+
+Для каждого пользователя хранится сумма количеств ингредиентов всех
+рецептов из его корзины, чтобы выгрузка списка покупок читала одну
+таблицу вместо соединения корзины, рецептов и ингредиентов.
+"""
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+
+from recipes.cache import bump_shopping_cart_versions_on_commit
+from recipes.models import IngredientToRecipe, ShoppingCart, ShoppingListItem
+
+
+def get_recipe_amounts(recipe_ids):
+    return dict(
+        IngredientToRecipe.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values('ingredient').annotate(
+            total_amount=Sum('amount')
+        ).order_by().values_list('ingredient', 'total_amount')
+    )
+
+
+def apply_deltas(user_ids, deltas):
+    """Прибавляет {ingredient_id: delta} к спискам покупок пользователей."""
+    deltas = {
+        ingredient_id: delta
+        for ingredient_id, delta in deltas.items() if delta
+    }
+    if not deltas:
+        return
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    ShoppingListItem.objects.bulk_create(
+        (
+            ShoppingListItem(
+                user_id=user_id, ingredient_id=ingredient_id, total_amount=0
+            )
+            for user_id in user_ids
+            for ingredient_id, delta in deltas.items() if delta > 0
+        ),
+        ignore_conflicts=True
+    )
+    items = ShoppingListItem.objects.filter(
+        user_id__in=user_ids, ingredient_id__in=deltas
+    )
+    items.update(total_amount=F('total_amount') + Case(
+        *(
+            When(ingredient_id=ingredient_id, then=Value(delta))
+            for ingredient_id, delta in deltas.items()
+        ),
+        output_field=IntegerField()
+    ))
+    if min(deltas.values()) < 0:
+        items.filter(total_amount__lte=0).delete()
+    bump_shopping_cart_versions_on_commit(user_ids)
+
+
+def add_recipes(user_id, recipe_ids):
+    apply_deltas((user_id,), get_recipe_amounts(recipe_ids))
+
+
+def remove_recipes(user_id, recipe_ids):
+    apply_deltas((user_id,), {
+        ingredient_id: -amount
+        for ingredient_id, amount in get_recipe_amounts(recipe_ids).items()
+    })
+
+
+def remove_recipe_from_all(recipe_id):
+    apply_deltas(
+        ShoppingCart.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('user_id', flat=True),
+        {
+            ingredient_id: -amount
+            for ingredient_id, amount in get_recipe_amounts(
+                (recipe_id,)
+            ).items()
+        }
+    )
+
+
+def change_recipe_amounts(recipe_id, old_amounts, new_amounts):
+    """Переносит изменение состава рецепта в списки всех, у кого он в корзине.
+
+    old_amounts и new_amounts — словари {ingredient_id: amount}.
+    """
+    apply_deltas(
+        ShoppingCart.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('user_id', flat=True),
+        {
+            ingredient_id: (new_amounts.get(ingredient_id, 0)
+                            - old_amounts.get(ingredient_id, 0))
+            for ingredient_id in {*old_amounts, *new_amounts}
+        }
+    )
+
+
+def get_expected_items():
+    """Агрегат по корзинам: {(user_id, ingredient_id): total_amount}."""
+    return {
+        (user_id, ingredient_id): total_amount
+        for user_id, ingredient_id, total_amount in
+        IngredientToRecipe.objects.filter(
+            recipe__shopping_carts__isnull=False
+        ).values(
+            'recipe__shopping_carts__user', 'ingredient'
+        ).annotate(
+            total_amount=Sum('amount')
+        ).order_by().values_list(
+            'recipe__shopping_carts__user', 'ingredient', 'total_amount'
+        ).iterator()
+    }
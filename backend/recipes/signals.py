@@ -0,0 +1,126 @@
+from django.db import transaction
+from django.db.models.signals import (
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from recipes import counters, feed
+from recipes.cache import (
+    bump_catalog_version,
+    bump_shopping_cart_versions_on_commit,
+    touch_recipes_state
+)
+from recipes.models import (
+    Ingredient,
+    Recipe,
+    ShoppingCart,
+    Tag
+)
+from recipes.shopping_list import remove_recipe_from_all
+from users.models import CustomUser
+
+AUTHOR_FIELDS = {'email', 'username', 'first_name', 'last_name'}
+
+
+@receiver((post_save, post_delete), sender=Tag)
+@receiver((post_save, post_delete), sender=Ingredient)
+def bump_catalog(sender, **kwargs):
+    catalog = sender._meta.model_name
+    transaction.on_commit(lambda: bump_catalog_version(catalog))
+
+
+@receiver((post_save, post_delete), sender=ShoppingCart)
+def bump_shopping_cart_version(instance, **kwargs):
+    bump_shopping_cart_versions_on_commit((instance.user_id,))
+
+
+@receiver(pre_delete, sender=Recipe)
+def remove_recipe_from_shopping_lists(instance, **kwargs):
+    remove_recipe_from_all(instance.pk)
+
+
+@receiver(post_save, sender=Recipe)
+def increment_recipes_count(instance, created, **kwargs):
+    if created:
+        counters.change_recipes_count(instance.author_id, 1)
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_recipe(instance, created, **kwargs):
+    if created:
+        feed.fan_out(instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def decrement_recipes_count(instance, **kwargs):
+    counters.change_recipes_count(instance.author_id, -1)
+
+
+@receiver(post_delete, sender=Recipe)
+def touch_recipes_state_on_delete(**kwargs):
+    transaction.on_commit(touch_recipes_state)
+
+
+@receiver(pre_delete, sender=CustomUser)
+def remove_user_favorites(instance, **kwargs):
+    counters.remove_favorites(
+        instance.pk,
+        instance.favorites.values_list('recipe_id', flat=True)
+    )
+
+
+@receiver(pre_delete, sender=CustomUser)
+def remove_user_follows(instance, **kwargs):
+    feed.decrement_followers(list(
+        instance.follower.values_list('author_id', flat=True)
+    ))
+
+
+def touch_recipes(**filters):
+    """Обновляет updated_at рецептов, в ответ которых входит объект.
+
+    Теги и ингредиенты рецепта меняются только вместе с сохранением самого
+    рецепта (API и админка), поэтому auto_now покрывает их без сигналов.
+    """
+    Recipe.objects.filter(**filters).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Tag)
+def touch_recipes_on_tag_change(instance, created, **kwargs):
+    if not created:
+        touch_recipes(tags=instance)
+
+
+@receiver(post_save, sender=Ingredient)
+def touch_recipes_on_ingredient_change(instance, created, **kwargs):
+    if not created:
+        touch_recipes(ingredients_to_recipes__ingredient=instance)
+
+
+@receiver(pre_save, sender=CustomUser)
+def check_author_change(instance, update_fields, **kwargs):
+    """Сравнивает данные автора в рецептах с сохранёнными в базе.
+
+    Полное сохранение пользователя (set_password, админка) пишет все
+    поля, поэтому одного update_fields мало, чтобы понять, изменилось ли
+    имя или почта.
+    """
+    fields = AUTHOR_FIELDS & set(update_fields or AUTHOR_FIELDS)
+    saved = None
+    if fields and not instance._state.adding:
+        saved = CustomUser.objects.filter(pk=instance.pk).values(
+            *fields
+        ).first()
+    instance.author_changed = saved is not None and any(
+        saved[field] != getattr(instance, field) for field in fields
+    )
+
+
+@receiver(post_save, sender=CustomUser)
+def touch_recipes_on_author_change(instance, **kwargs):
+    if getattr(instance, 'author_changed', False):
+        touch_recipes(author=instance)
@@ -0,0 +1,33 @@
+# Generated by Django 3.2.3 on 2026-10-18 17:54
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def fill_recipes_count(apps, schema_editor):
+    CustomUser = apps.get_model('users', 'CustomUser')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    CustomUser.objects.update(recipes_count=Coalesce(models.Subquery(
+        Recipe.objects.filter(
+            author=models.OuterRef('pk')
+        ).order_by().values('author').annotate(
+            count=models.Count('pk')
+        ).values('count')
+    ), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_auto_20231026_2354'),
+        ('recipes', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='recipes_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Количество рецептов'),
+        ),
+        migrations.RunPython(fill_recipes_count, migrations.RunPython.noop),
+    ]
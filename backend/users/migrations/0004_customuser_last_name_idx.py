@@ -0,0 +1,19 @@
+# Generated by Django 3.2.3 on 2026-10-18 18:09
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('users', '0003_customuser_recipes_count'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='customuser',
+            index=models.Index(fields=['last_name', 'id'], name='user_last_name_idx'),
+        ),
+    ]
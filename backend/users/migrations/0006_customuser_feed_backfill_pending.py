@@ -0,0 +1,18 @@
+# Generated by Django 3.2.3 on 2026-10-18 21:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_customuser_followers_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='feed_backfill_pending',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Ленты ждут дозаполнения'),
+        ),
+    ]
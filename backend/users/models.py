@@ -4,11 +4,51 @@ from django.db import models
 from backend.constants import MAX_USER_FIELD_LENGTH, MAX_STR_LENGTH
 
 
-class CustomUser(AbstractUser):
+class CounterFieldsMixin:
+    """Не перезаписывает денормализованные счётчики при сохранении.
+
+    Счётчики меняются только F()-выражениями, а полное сохранение
+    устаревшего экземпляра (например, пользователя из кэша токенов)
+    вернуло бы в них старые значения. Поэтому save() существующей строки
+    без update_fields пишет все поля, кроме counter_fields.
+    """
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (not self._state.adding and not args
+                and kwargs.get('update_fields') is None
+                and not kwargs.get('force_insert')):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+class CustomUser(CounterFieldsMixin, AbstractUser):
     email = models.EmailField(blank=False, unique=True)
     username = models.CharField(unique=True, max_length=MAX_USER_FIELD_LENGTH)
     first_name = models.CharField(max_length=MAX_USER_FIELD_LENGTH)
     last_name = models.CharField(max_length=MAX_USER_FIELD_LENGTH)
+    recipes_count = models.IntegerField(
+        verbose_name='Количество рецептов',
+        default=0,
+        editable=False
+    )
+    followers_count = models.IntegerField(
+        verbose_name='Количество подписчиков',
+        default=0,
+        editable=False
+    )
+    feed_backfill_pending = models.BooleanField(
+        verbose_name='Ленты ждут дозаполнения',
+        default=False,
+        editable=False
+    )
+    counter_fields = (
+        'recipes_count', 'followers_count', 'feed_backfill_pending'
+    )
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ('username', 'first_name', 'last_name')
 
@@ -16,6 +56,12 @@ class CustomUser(AbstractUser):
         ordering = ('last_name',)
         verbose_name = 'Пользователь'
         verbose_name_plural = 'Пользователи'
+        indexes = [
+            models.Index(
+                fields=('last_name', 'id'),
+                name='user_last_name_idx'
+            )
+        ]
 
     def __str__(self):
         return (f'{self.first_name[:MAX_STR_LENGTH]} '
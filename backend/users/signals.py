@@ -0,0 +1,22 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from users.models import CustomUser
+from users.tokens import invalidate_tokens
+
+IGNORED_USER_FIELDS = {'last_login'}
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(instance, **kwargs):
+    invalidate_tokens((instance.key,))
+
+
+@receiver(post_save, sender=CustomUser)
+def invalidate_user_tokens(instance, created, update_fields, **kwargs):
+    if created or update_fields and update_fields <= IGNORED_USER_FIELDS:
+        return
+    invalidate_tokens(
+        Token.objects.filter(user=instance).values_list('key', flat=True)
+    )
@@ -0,0 +1,15 @@
+import hashlib
+
+from django.core.cache import cache
+
+from backend.constants import AUTH_TOKEN_CACHE_KEY
+
+
+def get_token_cache_key(key):
+    return AUTH_TOKEN_CACHE_KEY.format(
+        key=hashlib.sha256(key.encode()).hexdigest()
+    )
+
+
+def invalidate_tokens(keys):
+    cache.delete_many([get_token_cache_key(key) for key in keys])